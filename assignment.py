@@ -0,0 +1,224 @@
+import datetime
+import re
+from typing import Dict, List
+
+from hash_table import HashTable
+from truck import Truck
+from utils import time_to_seconds
+
+# time the corrected address for a "wrong address" package becomes known
+DEFAULT_CORRECTION_TIME = datetime.time(10, 20, 0)
+
+TRUCK_PATTERN = re.compile(r"can only be on truck\s+(\d+)", re.IGNORECASE)
+DELAYED_PATTERN = re.compile(r"delayed.*?until\s+(\d{1,2}:\d{2})\s*([ap]\.?m\.?)", re.IGNORECASE)
+GROUP_PATTERN = re.compile(r"must be delivered with\s+([\d,\s]+)", re.IGNORECASE)
+WRONG_ADDRESS_PATTERN = re.compile(r"wrong address", re.IGNORECASE)
+
+
+class PackageConstraints:
+    def __init__(self) -> None:
+        self.truck_id = None
+        self.available_time = None
+        self.group = []
+        self.wrong_address = False
+
+    def __str__(self) -> str:
+        return(f"{self.truck_id}, {self.available_time}, {self.group}, {self.wrong_address}")
+
+
+def parse_notes(notes: str, correction_time: datetime.time = DEFAULT_CORRECTION_TIME) -> PackageConstraints:
+    """
+        Turn the free-text notes column of the package file into structured constraints.
+    """
+    constraints = PackageConstraints()
+    if not notes:
+        return constraints
+
+    match = TRUCK_PATTERN.search(notes)
+    if match:
+        constraints.truck_id = int(match.group(1))
+
+    match = DELAYED_PATTERN.search(notes)
+    if match:
+        meridiem = match.group(2).replace(".", "").upper()
+        constraints.available_time = datetime.datetime.strptime(f"{match.group(1)} {meridiem}", "%I:%M %p").time()
+
+    match = GROUP_PATTERN.search(notes)
+    if match:
+        constraints.group = [int(package_id) for package_id in re.findall(r"\d+", match.group(1))]
+
+    if WRONG_ADDRESS_PATTERN.search(notes):
+        constraints.wrong_address = True
+        # the package can't leave the hub until the address is corrected
+        if constraints.available_time is None or constraints.available_time < correction_time:
+            constraints.available_time = correction_time
+
+    return constraints
+
+
+class _Unit:
+    # a set of packages that has to ride on the same truck
+    def __init__(self, package_ids: List[int]) -> None:
+        self.package_ids = package_ids
+        self.truck_id = None
+        self.available = 0
+        self.deadline = None
+        self.addresses = []
+        self.internal_distance = 0.0
+        # set once a dispatcher has put the unit on a truck
+        self.taken = False
+
+
+def _find(parents: Dict[int, int], package_id: int) -> int:
+    while parents[package_id] != package_id:
+        parents[package_id] = parents[parents[package_id]]
+        package_id = parents[package_id]
+    return package_id
+
+
+def build_units(package_data: HashTable, distance_matrix,
+                correction_time: datetime.time = DEFAULT_CORRECTION_TIME) -> List[_Unit]:
+    """
+        Group packages that must be delivered together and merge their constraints.
+    """
+    constraints = {}
+    parents = {}
+    for key, package in package_data.items():
+        package_id = package.id
+        constraints[package_id] = parse_notes(getattr(package, "notes", ""), correction_time)
+        parents[package_id] = package_id
+
+    # union every package with the packages its notes say it travels with
+    for package_id, constraint in constraints.items():
+        for other_id in constraint.group:
+            if other_id in parents:
+                parents[_find(parents, other_id)] = _find(parents, package_id)
+
+    members = {}
+    for package_id in sorted(parents):
+        members.setdefault(_find(parents, package_id), []).append(package_id)
+
+    units = []
+    for package_ids in members.values():
+        unit = _Unit(package_ids)
+        for package_id in package_ids:
+            constraint = constraints[package_id]
+            package = package_data.find(package_id)
+
+            if constraint.truck_id is not None:
+                if unit.truck_id is not None and unit.truck_id != constraint.truck_id:
+                    raise ValueError(f"packages {package_ids} must ride together but are restricted to "
+                                     f"trucks {unit.truck_id} and {constraint.truck_id}")
+                unit.truck_id = constraint.truck_id
+
+            if constraint.available_time is not None:
+                unit.available = max(unit.available, time_to_seconds(constraint.available_time))
+
+            deadline = package.deadline_seconds
+            if deadline is not None and (unit.deadline is None or deadline < unit.deadline):
+                unit.deadline = deadline
+
+            # a wrong address can't be routed to yet, so cost it from the hub
+            if constraint.wrong_address:
+                address_index = 0
+            elif package.address_index is not None:
+                address_index = package.address_index
+            else:
+                address_index = distance_matrix.index(package.address)
+            if address_index not in unit.addresses:
+                unit.addresses.append(address_index)
+
+        # rough length of a tour through the unit's own stops, chained nearest first
+        current = unit.addresses[0]
+        pending = unit.addresses[1:]
+        while pending:
+            nearest = min(pending, key=lambda address: distance_matrix.distance(current, address))
+            unit.internal_distance += distance_matrix.distance(current, nearest)
+            pending.remove(nearest)
+            current = nearest
+        units.append(unit)
+    return units
+
+
+def assign_packages(package_data: HashTable, trucks: List[Truck], distance_matrix,
+                    correction_time: datetime.time = DEFAULT_CORRECTION_TIME) -> List[int]:
+    """
+        Load every package onto one of the trucks, respecting truck restrictions,
+        delayed arrivals, must-ship-together groups, wrong-address holds, capacity
+        and deadlines.
+
+        Units are placed most-constrained first, each onto the eligible truck whose
+        current stops are closest to it (cheapest insertion).  Each truck keeps the
+        distance from every address to its nearest stop, so scoring a unit is O(1)
+        per address and truck.  Packages with a deadline go on the priority list.
+        Returns the ids of any packages that could not be placed.
+    """
+    units = build_units(package_data, distance_matrix, correction_time)
+    hub = 0
+
+    # per truck: remaining capacity, distance from every address to the nearest stop,
+    # and the estimated time the priority run finishes
+    reach = []
+    priority_finish = []
+    remaining = []
+    stops = []
+    for truck in trucks:
+        reach.append(list(distance_matrix.row(hub)))
+        stops.append({hub})
+        priority_finish.append(time_to_seconds(truck.depart_time))
+        remaining.append(truck.capacity - truck.package_count())
+
+    def eligible(truck_number: int, unit: _Unit) -> bool:
+        truck = trucks[truck_number]
+        if unit.truck_id is not None and truck.id != unit.truck_id:
+            return False
+        if remaining[truck_number] < len(unit.package_ids):
+            return False
+        return time_to_seconds(truck.depart_time) >= unit.available
+
+    # deadlines first, then the units with the fewest trucks to choose from
+    def order(unit: _Unit):
+        choices = sum(1 for number in range(len(trucks)) if eligible(number, unit))
+        return (unit.deadline is None, unit.deadline or 0, choices, -len(unit.package_ids))
+
+    unassigned = []
+    for unit in sorted(units, key=order):
+        best_truck = None
+        best_cost = float('inf')
+        for number in range(len(trucks)):
+            if not eligible(number, unit):
+                continue
+            truck_reach = reach[number]
+            entry = min(truck_reach[address] for address in unit.addresses)
+            cost = entry + unit.internal_distance
+
+            # estimate when the first stop of this unit would be reached on the priority run
+            if unit.deadline is not None:
+                arrival = priority_finish[number] + int(entry / trucks[number].speed * 3600)
+                if arrival > unit.deadline:
+                    continue
+
+            if cost < best_cost:
+                best_cost = cost
+                best_truck = number
+
+        if best_truck is None:
+            unassigned.extend(unit.package_ids)
+            continue
+
+        truck = trucks[best_truck]
+        if unit.deadline is not None:
+            truck.priority_packages.extend(unit.package_ids)
+            priority_finish[best_truck] += int(best_cost / truck.speed * 3600)
+        else:
+            truck.standard_packages.extend(unit.package_ids)
+        remaining[best_truck] -= len(unit.package_ids)
+
+        # pull every address a little closer to this truck now that it stops here
+        for address in unit.addresses:
+            if address in stops[best_truck]:
+                continue
+            stops[best_truck].add(address)
+            reach[best_truck] = list(map(min, reach[best_truck], distance_matrix.row(address)))
+
+    return unassigned
@@ -0,0 +1,177 @@
+from event_log import DELIVERED
+from route_cache import RouteCache
+from simulation import Simulation
+from utils import load_distance_matrix, seconds_to_time
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import datetime
+import json
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+
+# distance data parsed once per worker process by _init_worker, and the worker's route cache
+_distance_matrix = None
+_route_cache = None
+
+
+class Scenario:
+    def __init__(self, name: str, package_file: str, depart_times: List[datetime.time], speed: float = 18,
+                 capacity: int = 16, improve: bool = False, drivers: Optional[int] = None) -> None:
+        self.name = name
+        self.package_file = package_file
+        self.depart_times = depart_times
+        self.speed = speed
+        self.capacity = capacity
+        self.improve = improve
+        self.drivers = drivers
+
+    def __str__(self) -> str:
+        times = [depart_time.strftime("%H:%M") for depart_time in self.depart_times]
+        return(f"{self.name}, {self.package_file}, {times}, {self.speed}, {self.capacity}, {self.improve}, {self.drivers}")
+
+
+def _init_worker(distance_file: str, address_file: str, route_cache_file: Optional[str] = None) -> None:
+    global _distance_matrix, _route_cache
+    _distance_matrix = load_distance_matrix(distance_file, address_file, use_cache=True)
+    _route_cache = RouteCache(path=route_cache_file, track_added=True)
+
+
+def simulate(scenario: Scenario, distance_matrix, route_cache: Optional[RouteCache] = None) -> Dict:
+    """
+        Load, route and deliver one scenario and return its mileage and on-time results.
+    """
+    simulation = Simulation(scenario.package_file, distance_matrix, depart_times=scenario.depart_times,
+                            speed=scenario.speed, capacity=scenario.capacity, improve=scenario.improve,
+                            drivers=scenario.drivers, route_cache=route_cache)
+    simulation.run()
+    package_data = simulation.package_data
+    event_log = simulation.event_log
+    truck_miles = simulation.truck_distances
+    unassigned = simulation.unassigned
+
+    on_time = 0
+    late = []
+    for package in package_data.values():
+        if package.delivery_status != DELIVERED:
+            continue
+        if package.deadline_seconds is not None and package.delivery_seconds > package.deadline_seconds:
+            late.append(package.id)
+        else:
+            on_time += 1
+
+    finished_at = None
+    if len(event_log) > 0:
+        finished_at = seconds_to_time(max(event_log.times)).strftime("%H:%M:%S")
+
+    return {
+        "name": scenario.name,
+        "total_miles": round(sum(truck_miles.values()), 2),
+        "truck_miles": {name: round(miles, 2) for name, miles in truck_miles.items()},
+        "packages": len(package_data),
+        "on_time": on_time,
+        "late": sorted(late),
+        "unassigned": sorted(unassigned),
+        "finished_at": finished_at,
+    }
+
+
+def _run_in_worker(scenario: Scenario) -> Tuple[Dict, List[tuple]]:
+    # hand the tours this scenario routed back, so the parent can keep them
+    result = simulate(scenario, _distance_matrix, _route_cache)
+    return result, _route_cache.take_added()
+
+
+def summarize(results: List[Dict]) -> Dict:
+    """
+        Roll per-scenario results up into one summary, ranking the scenarios that
+        delivered everything on time by mileage.
+    """
+    feasible = [result for result in results if len(result["late"]) == 0 and len(result["unassigned"]) == 0]
+    best = min(feasible, key=lambda result: result["total_miles"]) if feasible else None
+    return {
+        "scenarios": len(results),
+        "feasible": len(feasible),
+        "best": best["name"] if best is not None else None,
+        "best_miles": best["total_miles"] if best is not None else None,
+        "total_miles": round(sum(result["total_miles"] for result in results), 2),
+        "late_packages": sum(len(result["late"]) for result in results),
+        "unassigned_packages": sum(len(result["unassigned"]) for result in results),
+        "results": sorted(results, key=lambda result: result["total_miles"]),
+    }
+
+
+def run_batch(scenarios: List[Scenario], distance_file: str, address_file: str,
+              max_workers: Optional[int] = None, route_cache_file: Optional[str] = None) -> Dict:
+    """
+        Simulate every scenario across a process pool.  Each worker parses the
+        distance and address data once and reuses it for all of its scenarios.
+        With a route cache file, every worker starts from the tours saved there and
+        the tours routed in this batch are added to it at the end.
+    """
+    route_cache = RouteCache(path=route_cache_file)
+    if max_workers == 1:
+        distance_matrix = load_distance_matrix(distance_file, address_file, use_cache=True)
+        results = [simulate(scenario, distance_matrix, route_cache) for scenario in scenarios]
+    else:
+        chunk_size = max(1, len(scenarios) // ((max_workers or os.cpu_count() or 1) * 4))
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(distance_file, address_file, route_cache_file)) as executor:
+            results = []
+            for result, routes in executor.map(_run_in_worker, scenarios, chunksize=chunk_size):
+                results.append(result)
+                for key, tour, mileage in routes:
+                    route_cache.put(key, tour, mileage)
+
+    if route_cache_file is not None:
+        route_cache.save()
+    return summarize(results)
+
+
+def _parse_times(value: str) -> List[datetime.time]:
+    return [datetime.datetime.strptime(part.strip(), "%H:%M").time() for part in value.split(",")]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Simulate many delivery scenarios in parallel.")
+    parser.add_argument("--addresses", default="data/addresses.csv")
+    parser.add_argument("--distances", default="data/distances.csv")
+    parser.add_argument("--packages", nargs="+", default=["data/packages.csv"],
+                        help="one or more package manifests")
+    parser.add_argument("--departures", nargs="+", default=["09:05,08:00,10:20"],
+                        help="comma separated truck departure times, one set per variant")
+    parser.add_argument("--speeds", nargs="+", type=float, default=[18.0])
+    parser.add_argument("--capacity", type=int, default=16)
+    parser.add_argument("--improve", action="store_true", help="run the 2-opt/Or-opt pass on every route")
+    parser.add_argument("--drivers", type=int, default=None,
+                        help="run the day through the dispatch engine with this many drivers")
+    parser.add_argument("--route-cache", default=None,
+                        help="json file of routed tours to start from and add to")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default=None, help="write the JSON summary here instead of stdout")
+    args = parser.parse_args(argv)
+
+    # every combination of manifest, departure plan and speed is one scenario
+    scenarios = []
+    for package_file in args.packages:
+        for departures in args.departures:
+            for speed in args.speeds:
+                name = f"{os.path.basename(package_file)} @ {departures} @ {speed:g}mph"
+                scenarios.append(Scenario(name, package_file, _parse_times(departures), speed=speed,
+                                          capacity=args.capacity, improve=args.improve,
+                                          drivers=args.drivers))
+
+    summary = run_batch(scenarios, args.distances, args.addresses, max_workers=args.workers,
+                        route_cache_file=args.route_cache)
+
+    if args.output is not None:
+        with open(args.output, "w") as output_file:
+            json.dump(summary, output_file, indent=2)
+    else:
+        json.dump(summary, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
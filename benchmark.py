@@ -0,0 +1,201 @@
+from truck import Truck
+from assignment import assign_packages
+from dispatch import DispatchEngine
+from event_log import EventLog
+from profiling import DEFAULT_PROFILE_FILE, profiler
+from simulation import truck_name
+from utils import load_packages, load_distance_matrix, deliver_packages, display_all_package_data
+from workload import generate_workload
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+
+class PhaseTimer:
+    """
+        Times named phases of a run and, when tracing is on, records the peak
+        Python memory allocated inside each one.
+    """
+    def __init__(self, trace_memory: bool = True) -> None:
+        self.trace_memory = trace_memory
+        self.phases = []
+
+    @contextlib.contextmanager
+    def phase(self, name: str, items: int = 0):
+        # the record is yielded so a phase can fill in its item count once it knows it
+        record = {"phase": name, "seconds": 0.0, "items": items, "per_second": None}
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        yield record
+        elapsed = time.perf_counter() - started
+        record["seconds"] = round(elapsed, 6)
+        if elapsed > 0 and record["items"]:
+            record["per_second"] = round(record["items"] / elapsed, 1)
+        if self.trace_memory:
+            record["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+        self.phases.append(record)
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(address_file: str, distance_file: str, package_file: str, trucks: int = 3,
+                  capacity: Optional[int] = None, trace_memory: bool = True,
+                  use_cache: bool = False) -> List[Dict]:
+    """
+        Run the load, query, assignment, routing and render phases once over the
+        given data files, then simulate the day with the dispatch engine, and
+        return one timing record per phase.
+    """
+    timer = PhaseTimer(trace_memory)
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        with timer.phase("load_distances") as record:
+            distance_matrix = load_distance_matrix(distance_file, address_file, use_cache=use_cache)
+            record["items"] = len(distance_matrix)
+
+        with timer.phase("load_packages") as record:
+            package_data = load_packages(package_file, distance_matrix.address_index)
+            record["items"] = len(package_data)
+        keys = list(package_data.keys())
+
+        with timer.phase("hash_table_find", items=len(keys)):
+            for key in keys:
+                package_data.find(key)
+
+        # enough room on the trucks for the whole manifest unless told otherwise
+        if capacity is None:
+            capacity = max(16, -(-len(keys) // trucks))
+        fleet = [Truck(id=number, name=truck_name(number), depart_time=datetime.time(8, 0, 0), capacity=capacity)
+                 for number in range(1, trucks + 1)]
+
+        with timer.phase("assign_packages", items=len(keys)):
+            assign_packages(package_data, fleet, distance_matrix)
+
+        event_log = EventLog()
+        with timer.phase("deliver_packages", items=sum(truck.package_count() for truck in fleet)):
+            for truck in fleet:
+                deliver_packages(truck, package_data, distance_matrix, event_log=event_log)
+
+        # render into a buffer so terminal speed doesn't count
+        with timer.phase("display_all_package_data", items=len(keys)):
+            with contextlib.redirect_stdout(io.StringIO()):
+                display_all_package_data(package_data, datetime.time(10, 0, 0), event_log)
+
+        # the same day again through the event-driven engine, trucks coming back for more
+        for package in package_data.values():
+            package.reset()
+        fleet = [Truck(id=number, name=truck_name(number), depart_time=datetime.time(8, 0, 0))
+                 for number in range(1, trucks + 1)]
+        with timer.phase("dispatch_day", items=len(keys)):
+            DispatchEngine(package_data, distance_matrix, fleet, event_log=EventLog()).run()
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    return timer.phases
+
+
+def compare(current: Dict, previous: Optional[Dict]) -> List[str]:
+    lines = []
+    previous_phases = {}
+    if previous is not None:
+        previous_phases = {phase["phase"]: phase for phase in previous["phases"]}
+    for phase in current["phases"]:
+        line = f"{phase['phase']:<26} {phase['seconds']:>10.4f}s"
+        if phase["per_second"] is not None:
+            line += f" {phase['per_second']:>14,.0f}/s"
+        else:
+            line += " " * 17
+        if "peak_mb" in phase:
+            line += f" {phase['peak_mb']:>9.2f} MB"
+        before = previous_phases.get(phase["phase"])
+        if before is not None and before["seconds"] > 0:
+            change = (phase["seconds"] - before["seconds"]) / before["seconds"] * 100
+            line += f"  {change:+6.1f}% vs {previous.get('revision') or 'previous'}"
+        lines.append(line)
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the WGUPS load, route and query phases.")
+    parser.add_argument("--addresses", type=int, default=1000)
+    parser.add_argument("--packages", type=int, default=5000)
+    parser.add_argument("--trucks", type=int, default=10)
+    parser.add_argument("--capacity", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=None,
+                        help="reuse/write the generated csv files here (default: workloads/<size>)")
+    parser.add_argument("--distance-cache", action="store_true",
+                        help="load distances through the memory-mapped binary cache")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc, which slows every phase down")
+    parser.add_argument("--profile", nargs="?", const=DEFAULT_PROFILE_FILE, default=None,
+                        help="count hash table probes, distance lookups and routing steps; write them here "
+                             "(.pstats/.prof for cProfile data)")
+    parser.add_argument("--results", default="benchmark_results.jsonl",
+                        help="append results here and compare against the last run of the same size")
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or os.path.join("workloads", f"{args.addresses}x{args.packages}-s{args.seed}")
+    address_file = os.path.join(data_dir, "addresses.csv")
+    distance_file = os.path.join(data_dir, "distances.csv")
+    package_file = os.path.join(data_dir, "packages.csv")
+    if not all(os.path.exists(file) for file in (address_file, distance_file, package_file)):
+        print(f"Generating {args.addresses} addresses and {args.packages} packages in {data_dir}...")
+        generate_workload(data_dir, args.addresses, args.packages, args.trucks, args.seed)
+
+    if args.profile is not None:
+        profiler.enable(args.profile)
+    phases = run_benchmark(address_file, distance_file, package_file, trucks=args.trucks, capacity=args.capacity,
+                           trace_memory=not args.no_memory, use_cache=args.distance_cache)
+    result = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "addresses": args.addresses,
+        "packages": args.packages,
+        "trucks": args.trucks,
+        "seed": args.seed,
+        "memory_traced": not args.no_memory,
+        "distance_cache": args.distance_cache,
+        "profiled": profiler.enabled,
+        "phases": phases,
+    }
+    if profiler.enabled:
+        result["counters"] = profiler.report()["counters"]
+
+    # last earlier run with the same workload and the same measurement mode; instrumented
+    # timings aren't comparable with plain ones
+    previous = None
+    if os.path.exists(args.results):
+        with open(args.results) as results_file:
+            for line in results_file:
+                record = json.loads(line)
+                if all(record.get(key) == result[key] for key in ("addresses", "packages", "trucks", "seed",
+                                                                   "memory_traced", "distance_cache")) \
+                        and record.get("profiled", False) == result["profiled"]:
+                    previous = record
+
+    for line in compare(result, previous):
+        print(line)
+
+    with open(args.results, "a") as results_file:
+        results_file.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+# the modules live at the repository root; this file puts it on sys.path for pytest
+from utils import load_distance_matrix
+import os
+import pytest
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+@pytest.fixture(scope="session")
+def distance_matrix():
+    # the WGUPS distances, parsed from the csv
+    return load_distance_matrix(os.path.join(DATA_DIR, "distances.csv"), os.path.join(DATA_DIR, "addresses.csv"))
@@ -0,0 +1,430 @@
+from truck import Truck
+from hash_table import HashTable
+from assignment import DEFAULT_CORRECTION_TIME, build_units
+from event_log import AT_HUB, DELIVERED, DEPARTED, EN_ROUTE, RETURNED
+from updates import PackageUpdate, apply_changes
+from utils import plan_route, seconds_to_time, time_to_seconds
+import datetime
+import heapq
+from typing import Dict, List, Optional
+
+# event kinds; at the same instant they are handled in this order, so packages that
+# arrive at 9:05 are on the dock before a truck leaving at 9:05 is loaded
+ADDRESS_CORRECTION = 0
+PACKAGE_AVAILABLE = 1
+RETURN_TO_HUB = 2
+ARRIVE = 3
+DEPART = 4
+
+HUB = 0
+
+# no truck delivers or drives back to the hub after this; what's left stays at the hub
+END_OF_DAY = datetime.time(23, 59, 59)
+
+
+class _TruckState:
+    # where a truck is during the simulated day and what it still has to do
+    __slots__ = ("truck", "location", "route", "position", "miles", "load_miles")
+
+    def __init__(self, truck: Truck) -> None:
+        self.truck = truck
+        self.location = HUB
+        self.route = []
+        self.position = 0
+        self.miles = 0.0
+        self.load_miles = 0.0
+
+
+class _Pool:
+    """
+        Units waiting at the hub that one set of trucks may take: a heap of the
+        ones with deadlines, every unit filed under its first address and a heap
+        of those addresses by distance from the hub.  Taken units are left in the
+        heaps and lists and skipped later; an address is dropped from by_address
+        as soon as none of its units are left, and from urgent as soon as none of
+        its units with a deadline are.
+    """
+    def __init__(self) -> None:
+        self.deadlines = []
+        self.by_address = {}
+        self.remaining = {}
+        self.urgent = {}
+        self.nearest = []
+        self.count = 0
+
+    def add(self, unit, hub_distance: float) -> None:
+        address = unit.addresses[0]
+        if unit.deadline is not None:
+            heapq.heappush(self.deadlines, (unit.deadline, unit.package_ids[0], unit))
+            self.urgent[address] = self.urgent.get(address, 0) + 1
+        if address in self.by_address:
+            self.by_address[address].append(unit)
+            self.remaining[address] += 1
+        else:
+            self.by_address[address] = [unit]
+            self.remaining[address] = 1
+            heapq.heappush(self.nearest, (hub_distance, address))
+        self.count += 1
+
+    def take(self, unit) -> None:
+        unit.taken = True
+        self.count -= 1
+        address = unit.addresses[0]
+        self.remaining[address] -= 1
+        if self.remaining[address] == 0:
+            del self.remaining[address]
+            del self.by_address[address]
+        if unit.deadline is not None:
+            self.urgent[address] -= 1
+            if self.urgent[address] == 0:
+                del self.urgent[address]
+
+    def next_deadline(self):
+        deadlines = self.deadlines
+        while deadlines and deadlines[0][2].taken:
+            heapq.heappop(deadlines)
+        return deadlines[0] if deadlines else None
+
+    def nearest_address(self):
+        nearest = self.nearest
+        while nearest and nearest[0][1] not in self.by_address:
+            heapq.heappop(nearest)
+        return nearest[0] if nearest else None
+
+
+class DispatchEngine:
+    """
+        Discrete-event simulation of a whole delivery day.
+
+        Every truck and driver shares one clock driven by a heap of timed events:
+        depart, arrive, return-to-hub, package-available and address-correction.
+        A truck leaves once it is ready, a driver is free and there is work at the
+        hub; it takes the most urgent packages first and fills the rest of its
+        capacity with packages close to them, delivers stop by stop and comes back
+        for another load while any work is left.  Nothing happens after end_time:
+        stops a route would reach later are left off it, and their packages stay
+        at the hub undelivered.
+    """
+    def __init__(self, package_data: HashTable, distance_matrix, trucks: List[Truck], drivers: Optional[int] = None,
+                 event_log=None, improve: bool = False,
+                 correction_time: datetime.time = DEFAULT_CORRECTION_TIME, route_cache=None,
+                 end_time: datetime.time = END_OF_DAY) -> None:
+        self.package_data = package_data
+        self.distance_matrix = distance_matrix
+        self.trucks = trucks
+        self.drivers = len(trucks) if drivers is None else drivers
+        self.event_log = event_log
+        self.improve = improve
+        self.correction_time = correction_time
+        self.route_cache = route_cache
+        self.end_seconds = time_to_seconds(end_time)
+
+        self.events = []
+        self.sequence = 0
+        self.now = 0
+        self.states = {truck.name: _TruckState(truck) for truck in trucks}
+        self.free_drivers = self.drivers
+        # trucks parked at the hub, in the order they became ready
+        self.ready = []
+        self.changed = False
+        self.pools = {}
+        self.pending_units = 0
+
+    def schedule(self, seconds: int, kind: int, payload=None) -> None:
+        heapq.heappush(self.events, (seconds, kind, self.sequence, payload))
+        self.sequence += 1
+
+    def schedule_update(self, update: PackageUpdate) -> None:
+        # the change becomes known at update.time; packages are routed from their
+        # data as it is when they are loaded, and a truck already out with the
+        # package is re-routed from its next stop
+        if "address" in update.changes:
+            # fail before the day is simulated rather than part way through it
+            self.distance_matrix.index(update.changes["address"])
+        self.schedule(time_to_seconds(update.time), ADDRESS_CORRECTION, update)
+
+    def _pool_for(self, truck_id: Optional[int]) -> _Pool:
+        pool = self.pools.get(truck_id)
+        if pool is None:
+            pool = _Pool()
+            self.pools[truck_id] = pool
+        return pool
+
+    def _resolve_addresses(self, unit) -> None:
+        # the addresses as they are now, with any corrections made before the unit reached the hub
+        addresses = []
+        for package_id in unit.package_ids:
+            package = self.package_data.find(package_id)
+            address_index = package.address_index
+            if address_index is None:
+                address_index = self.distance_matrix.index(package.address)
+            if address_index not in addresses:
+                addresses.append(address_index)
+        unit.addresses = addresses
+
+    def _work_remaining(self) -> bool:
+        return self.pending_units > 0 or any(pool.count > 0 for pool in self.pools.values())
+
+    def run(self, start_time: datetime.time = datetime.time(8, 0, 0)) -> float:
+        """
+            Simulate the day and return the total miles driven by every truck.
+        """
+        start_seconds = time_to_seconds(start_time)
+        for unit in build_units(self.package_data, self.distance_matrix, self.correction_time):
+            self.pending_units += 1
+            self.schedule(max(unit.available, start_seconds), PACKAGE_AVAILABLE, unit)
+        for truck in self.trucks:
+            self.schedule(max(time_to_seconds(truck.depart_time), start_seconds), DEPART, self.states[truck.name])
+
+        handlers = {ADDRESS_CORRECTION: self._on_address_correction, PACKAGE_AVAILABLE: self._on_package_available,
+                    RETURN_TO_HUB: self._on_return_to_hub, ARRIVE: self._on_arrive, DEPART: self._on_depart}
+        events = self.events
+        while events:
+            seconds, kind, sequence, payload = heapq.heappop(events)
+            self.now = seconds
+            handlers[kind](payload)
+            # load trucks once everything due at this instant has happened, so a
+            # batch of packages arriving together goes out together
+            if self.changed and (not events or events[0][0] > seconds):
+                self.changed = False
+                self._dispatch()
+
+        return sum(state.miles for state in self.states.values())
+
+    # --- event handlers -------------------------------------------------------------
+
+    def _on_address_correction(self, update: PackageUpdate) -> None:
+        package = self.package_data.find(update.package_id)
+        if package is None:
+            return
+        address_index = None
+        if "address" in update.changes:
+            address_index = self.distance_matrix.index(update.changes["address"])
+        apply_changes(package, update.changes, address_index)
+        if package.delivery_status == EN_ROUTE and package.truck is not None:
+            self._reroute(self.states[package.truck.name], package.id)
+
+    def _on_package_available(self, unit) -> None:
+        self.pending_units -= 1
+        self._resolve_addresses(unit)
+        self._pool_for(unit.truck_id).add(unit, self.distance_matrix.distance(HUB, unit.addresses[0]))
+        self.changed = True
+
+    def _on_depart(self, state: _TruckState) -> None:
+        # the truck is ready at the hub from now on
+        self.ready.append(state)
+        self.changed = True
+
+    def _on_return_to_hub(self, state: _TruckState) -> None:
+        state.location = HUB
+        state.truck.stats.returned(self.now, state.miles)
+        self.free_drivers += 1
+        self.ready.append(state)
+        self.changed = True
+        if self.event_log is not None:
+            self.event_log.record(self.now, RETURNED, None, state.truck, state.miles)
+
+    def _on_arrive(self, state: _TruckState) -> None:
+        stop = state.route[state.position]
+        truck = state.truck
+        state.location = stop.address_index
+        state.miles = state.load_miles + stop.mileage
+        delivery_time = seconds_to_time(self.now)
+
+        for package_id in stop.package_ids:
+            package = self.package_data.find(package_id)
+            package.delivery_status = DELIVERED
+            package.delivery_time = delivery_time
+            package.delivered_by = truck
+            truck.stats.delivered(package_id, self.now, state.miles, package.deadline_seconds)
+            if self.event_log is not None:
+                self.event_log.record(self.now, DELIVERED, package_id, truck, state.miles)
+
+        truck.route.append(stop)
+        state.position += 1
+        if state.position < len(state.route):
+            self.schedule(state.route[state.position].arrive_seconds, ARRIVE, state)
+        else:
+            # head back for another load, unless there is nothing left or the day
+            # is over by the time the truck gets there; then it ends at the last stop
+            distance = self.distance_matrix.distance(state.location, HUB)
+            return_seconds = self.now + int(distance / truck.speed * 60) * 60
+            if self._work_remaining() and return_seconds <= self.end_seconds:
+                state.miles += distance
+                self.schedule(return_seconds, RETURN_TO_HUB, state)
+            else:
+                self.free_drivers += 1
+                self.changed = True
+
+    # --- loading --------------------------------------------------------------------
+
+    def _dispatch(self) -> None:
+        # send out every ready truck we have a driver and packages for
+        if self.now >= self.end_seconds:
+            return
+        waiting = []
+        for state in self.ready:
+            if not (self.free_drivers > 0 and self._load(state) and self._depart(state)):
+                waiting.append(state)
+        self.ready = waiting
+
+    def _load(self, state: _TruckState) -> bool:
+        truck = state.truck
+        capacity = truck.capacity
+        pools = [pool for pool in (self.pools.get(None), self.pools.get(truck.id)) if pool is not None]
+        if sum(pool.count for pool in pools) == 0:
+            return False
+
+        taken = []
+        size = 0
+
+        # the most urgent unit across the shared pool and this truck's own seeds the load,
+        # or with no deadlines left, the address nearest the hub
+        best = None
+        for pool in pools:
+            entry = pool.next_deadline()
+            if entry is not None and (best is None or entry < best[0]):
+                best = (entry, pool)
+        if best is not None and len(best[0][2].package_ids) <= capacity:
+            unit = heapq.heappop(best[1].deadlines)[2]
+            best[1].take(unit)
+            taken.append(unit)
+            size += len(unit.package_ids)
+            seed = unit.addresses[0]
+        else:
+            seed = min((entry for entry in map(_Pool.nearest_address, pools) if entry is not None))[1]
+
+        # fill outward from the seed, first with units that have deadlines, then with anything.  deadline units
+        # are only fetched from within twice the distance a plain nearest fill would go, so a load doesn't
+        # cross the map for them
+        neighbors, distances = self.distance_matrix.neighbors(seed)
+        reach = 0.0
+        found = size
+        for address, distance in zip(neighbors, distances):
+            if found >= capacity:
+                break
+            for pool in pools:
+                found += pool.remaining.get(address, 0)
+            reach = distance
+        if found < capacity:
+            reach = distances[-1]
+        for urgent_only in (True, False):
+            for address, distance in zip(neighbors, distances):
+                if size >= capacity:
+                    break
+                if urgent_only and (distance > 2 * reach or not any(pool.urgent for pool in pools)):
+                    break
+                if not urgent_only and all(pool.count == 0 for pool in pools):
+                    break
+                for pool in pools:
+                    if urgent_only and address not in pool.urgent:
+                        continue
+                    units = pool.by_address.get(address)
+                    if units is None:
+                        continue
+                    for unit in units:
+                        if unit.taken or (urgent_only and unit.deadline is None):
+                            continue
+                        if size + len(unit.package_ids) <= capacity:
+                            pool.take(unit)
+                            taken.append(unit)
+                            size += len(unit.package_ids)
+                    if address in pool.by_address:
+                        # drop the units already on a truck so the list doesn't keep growing
+                        pool.by_address[address] = [unit for unit in units if not unit.taken]
+
+        if not taken:
+            return False
+
+        del truck.priority_packages[:]
+        del truck.standard_packages[:]
+        for unit in taken:
+            if unit.deadline is not None:
+                truck.priority_packages.extend(unit.package_ids)
+            else:
+                truck.standard_packages.extend(unit.package_ids)
+        return True
+
+    def _depart(self, state: _TruckState) -> bool:
+        """
+            Route the loaded truck from where it is and send it off.  Stops it
+            couldn't reach by the end of the day are left off the route.  Returns
+            False, with the truck still at the hub, when no stop is left.
+        """
+        truck = state.truck
+        route = plan_route(truck, self.package_data, self.distance_matrix, start_index=state.location,
+                           start_seconds=self.now, improve=self.improve, route_cache=self.route_cache)
+        del truck.priority_packages[:]
+        del truck.standard_packages[:]
+        # arrival times only go up along a route
+        while route and route[-1].arrive_seconds > self.end_seconds:
+            route.pop()
+        if not route:
+            return False
+
+        self.free_drivers -= 1
+        state.load_miles = state.miles
+        state.route = route
+        state.position = 0
+        truck.stats.departed(self.now)
+
+        if self.event_log is not None:
+            self.event_log.record(self.now, DEPARTED, None, truck, state.miles)
+        for stop in route:
+            for package_id in stop.package_ids:
+                if self.event_log is not None:
+                    self.event_log.record(self.now, EN_ROUTE, package_id, truck, state.miles)
+                package = self.package_data.find(package_id)
+                package.delivery_status = EN_ROUTE
+                package.delivered_by = truck
+
+        self.schedule(route[0].arrive_seconds, ARRIVE, state)
+        return True
+
+    def _reroute(self, state: _TruckState, package_id: int) -> None:
+        """
+            Route again what is left of a truck's load after one of its packages
+            changed.  The stop the truck is driving to is kept, so its pending
+            arrival stands, but the changed package is taken off it; the rest is
+            routed from there.  As when a truck leaves, packages the new route
+            can't reach by the end of the day are left undelivered at the hub.
+        """
+        truck = state.truck
+        if state.position >= len(state.route):
+            return
+        next_stop = state.route[state.position]
+        if package_id in next_stop.package_ids:
+            next_stop.package_ids = [other for other in next_stop.package_ids if other != package_id]
+            remaining = [package_id]
+        else:
+            remaining = []
+        for stop in state.route[state.position + 1:]:
+            remaining.extend(stop.package_ids)
+
+        for other in remaining:
+            if self.package_data.find(other).deadline_seconds is not None:
+                truck.priority_packages.append(other)
+            else:
+                truck.standard_packages.append(other)
+        route = plan_route(truck, self.package_data, self.distance_matrix, start_index=next_stop.address_index,
+                           start_seconds=next_stop.arrive_seconds, improve=self.improve,
+                           route_cache=self.route_cache)
+        del truck.priority_packages[:]
+        del truck.standard_packages[:]
+        # plan_route counts miles from the next stop, the load's stops count them from the hub
+        for stop in route:
+            stop.mileage += next_stop.mileage
+        while route and route[-1].arrive_seconds > self.end_seconds:
+            for other in route.pop().package_ids:
+                package = self.package_data.find(other)
+                package.delivery_status = AT_HUB
+                package.delivered_by = "N/A"
+                if self.event_log is not None:
+                    self.event_log.retract([other], EN_ROUTE)
+        state.route[state.position + 1:] = route
+
+    def truck_miles(self) -> Dict[str, float]:
+        return {name: state.miles for name, state in self.states.items()}
+
+    def truck_deliveries(self) -> Dict[str, int]:
+        return {name: state.truck.stats.packages for name, state in self.states.items()}
@@ -0,0 +1,165 @@
+from distance_matrix import DistanceMatrix
+from array import array
+import csv
+import mmap
+import os
+import struct
+import zlib
+from typing import List, Optional
+
+# magic, format version, decimal places, address count, source size, source mtime (ns), payload crc32
+HEADER = struct.Struct("<4sHBxIQqI")
+MAGIC = b"WGDM"
+VERSION = 1
+CACHE_SUFFIX = ".dmcache"
+
+
+def default_cache_file(distance_file: str) -> str:
+    return distance_file + CACHE_SUFFIX
+
+
+def _triangle_offset(row: int, col: int) -> int:
+    # position of (row, col), col < row, in the packed triangle below the diagonal
+    return row * (row - 1) // 2 + col
+
+
+def compile_distances(distance_file: str, cache_file: Optional[str] = None) -> str:
+    """
+        Convert distances.csv into a binary cache: a header followed by every
+        distance below the diagonal as float32, one csv row after another.
+
+        The csv is streamed row by row, so compiling never holds more than one row
+        in memory.  The header records the source file's size and modification
+        time, so a changed csv is detected without reading it, and a crc32 of the
+        packed distances.  Returns the cache file path.
+    """
+    cache_file = cache_file or default_cache_file(distance_file)
+    source = os.stat(distance_file)
+    temp_file = f"{cache_file}.{os.getpid()}.tmp"
+
+    count = 0
+    decimals = 0
+    checksum = 0
+    with open(distance_file, newline="") as csv_file, open(temp_file, "wb") as cache:
+        cache.write(HEADER.pack(MAGIC, VERSION, 0, 0, 0, 0, 0))
+        for row, cells in enumerate(csv.reader(csv_file)):
+            values = array('f', bytes(4 * row))
+            for col in range(min(row, len(cells))):
+                cell = cells[col].strip()
+                if cell == '':
+                    continue
+                values[col] = float(cell)
+                if '.' in cell:
+                    decimals = max(decimals, len(cell) - cell.index('.') - 1)
+            data = values.tobytes()
+            checksum = zlib.crc32(data, checksum)
+            cache.write(data)
+            count += 1
+
+        # now that everything is written, fill in the real header
+        cache.seek(0)
+        cache.write(HEADER.pack(MAGIC, VERSION, min(decimals, 6), count, source.st_size, source.st_mtime_ns,
+                                checksum))
+
+    os.replace(temp_file, cache_file)
+    return cache_file
+
+
+class MappedDistanceMatrix(DistanceMatrix):
+    """
+        DistanceMatrix backed by a memory-mapped cache file from compile_distances.
+
+        Nothing is parsed or copied at open time; the operating system pages the
+        distances in on first use.  Values are stored as float32 and rounded back
+        to the precision of the source csv on lookup, so results match the csv.
+    """
+    def __init__(self, cache_file: str, address_data: List[str]) -> None:
+        self.cache_file = cache_file
+        with open(cache_file, "rb") as cache:
+            self.mapping = mmap.mmap(cache.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header = read_header(self.mapping)
+        if header is None:
+            self.mapping.close()
+            raise ValueError(f"{cache_file} is not a distance cache")
+        self.decimals = header["decimals"]
+        self.checksum = header["checksum"]
+        self.count = header["count"]
+
+        size = len(address_data)
+        if header["count"] < size:
+            self.mapping.close()
+            raise ValueError(f"distance cache has {header['count']} rows, expected {size}")
+        self.size = size
+        self._set_addresses(address_data)
+        self.neighbor_lists = {}
+        self._version = None
+        self.values = memoryview(self.mapping)[HEADER.size:].cast('f')
+
+    def distance(self, start_index: int, end_index: int) -> float:
+        if start_index == end_index:
+            return 0.0
+        if start_index < end_index:
+            start_index, end_index = end_index, start_index
+        return round(self.values[start_index * (start_index - 1) // 2 + end_index], self.decimals)
+
+    def row(self, index: int) -> array:
+        # the part left of the diagonal is contiguous, the rest is one value per later row
+        base = _triangle_offset(index, 0)
+        decimals = self.decimals
+        result = array('d', [round(value, decimals) for value in self.values[base:base + index]])
+        result.append(0.0)
+        values = self.values
+        for other in range(index + 1, self.size):
+            result.append(round(values[other * (other - 1) // 2 + index], decimals))
+        return result
+
+    def _checksum(self) -> int:
+        # stored in the header when the cache was compiled, no need to read the distances,
+        # unless the csv has more rows than there are addresses
+        if self.count == self.size:
+            return self.checksum
+        return zlib.crc32(self.values[:_triangle_offset(self.size, 0)].cast('B'))
+
+    def verify(self) -> bool:
+        # re-read every distance and compare against the stored checksum
+        return zlib.crc32(self.values.cast('B')) == self.checksum
+
+    def close(self) -> None:
+        self.values.release()
+        self.mapping.close()
+
+
+def read_header(data) -> Optional[dict]:
+    if len(data) < HEADER.size:
+        return None
+    magic, version, decimals, count, source_size, source_mtime, checksum = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        return None
+    expected = HEADER.size + 4 * _triangle_offset(count, 0)
+    if len(data) < expected:
+        return None
+    return {"decimals": decimals, "count": count, "source_size": source_size, "source_mtime": source_mtime,
+            "checksum": checksum}
+
+
+def cache_is_current(distance_file: str, cache_file: str) -> bool:
+    """
+        True when the cache exists, is well formed and was built from the csv as it is now.
+    """
+    try:
+        source = os.stat(distance_file)
+        with open(cache_file, "rb") as cache:
+            header_bytes = cache.read(HEADER.size)
+            cache.seek(0, os.SEEK_END)
+            cache_size = cache.tell()
+    except OSError:
+        return False
+    if len(header_bytes) < HEADER.size:
+        return False
+    magic, version, decimals, count, source_size, source_mtime, checksum = HEADER.unpack(header_bytes)
+    if magic != MAGIC or version != VERSION:
+        return False
+    if cache_size != HEADER.size + 4 * _triangle_offset(count, 0):
+        return False
+    return source_size == source.st_size and source_mtime == source.st_mtime_ns
@@ -0,0 +1,95 @@
+from array import array
+import zlib
+from typing import List, Tuple
+
+
+class DistanceMatrix:
+    """
+        Dense, symmetric distance matrix built once from the raw csv data.
+
+        The lower-triangular rows returned by load_distances are mirrored into a
+        flat array of floats so every lookup is a single index operation, and the
+        address list is turned into an address -> index dict up front.
+    """
+    def __init__(self, distance_data: List[List[str]], address_data: List[str]) -> None:
+        size = len(address_data)
+        if len(distance_data) < size:
+            raise ValueError(f"distance data has {len(distance_data)} rows, expected {size}")
+
+        self.size = size
+        self._set_addresses(address_data)
+        self.neighbor_lists = {}
+        self._version = None
+
+        # parse every cell exactly once and mirror it across the diagonal
+        self.matrix = array('d', [0.0]) * (size * size)
+        for row in range(size):
+            cells = distance_data[row]
+            for col in range(min(row + 1, len(cells))):
+                if cells[col] == '':
+                    continue
+                value = float(cells[col])
+                self.matrix[row * size + col] = value
+                self.matrix[col * size + row] = value
+
+    def _set_addresses(self, address_data: List[str]) -> None:
+        self.addresses = list(address_data)
+        self.address_index = {}
+        for index, address in enumerate(self.addresses):
+            # keep the first index if an address is listed twice
+            self.address_index.setdefault(address, index)
+
+    def _checksum(self) -> int:
+        # the distances below the diagonal as float32, row after row, packed the way
+        # compile_distances stores them, so a csv and its cache get the same version
+        checksum = 0
+        size = self.size
+        for row in range(size):
+            checksum = zlib.crc32(array('f', self.matrix[row * size:row * size + row]).tobytes(), checksum)
+        return checksum
+
+    def version(self) -> int:
+        """
+            Checksum of the distances and the address list, computed once.  Anything
+            derived from the distances can be keyed on it to notice changed data.
+        """
+        if self._version is None:
+            checksum = zlib.crc32("\n".join(self.addresses).encode(), self._checksum())
+            self._version = checksum ^ (self.size << 32)
+        return self._version
+
+    def neighbors(self, index: int) -> Tuple[array, array]:
+        """
+            Every address sorted by distance from `index` (ties by index), with the
+            matching distances.  Built the first time an address is asked for and
+            kept, so repeated nearest-neighbor steps from it are a short walk.
+        """
+        lists = self.neighbor_lists.get(index)
+        if lists is None:
+            row = self.row(index)
+            order = array('i', sorted(range(self.size), key=row.__getitem__))
+            lists = (order, array('d', [row[other] for other in order]))
+            self.neighbor_lists[index] = lists
+        return lists
+
+    def __len__(self) -> int:
+        return self.size
+
+    def index(self, address: str) -> int:
+        # O(1) replacement for address_data.index(address)
+        try:
+            return self.address_index[address]
+        except KeyError:
+            raise ValueError(f"unknown address: {address}") from None
+
+    def address(self, index: int) -> str:
+        return self.addresses[index]
+
+    def distance(self, start_index: int, end_index: int) -> float:
+        return self.matrix[start_index * self.size + end_index]
+
+    def row(self, index: int) -> array:
+        # distances from one address to every other address
+        start = index * self.size
+        return self.matrix[start:start + self.size]
+
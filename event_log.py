@@ -0,0 +1,162 @@
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple
+
+# event kinds, in the order they happen to a package
+DEPARTED = "Departed"
+EN_ROUTE = "En Route"
+DELIVERED = "Delivered"
+# truck events with no package
+RETURNED = "Returned"
+
+# status a package has before its first event
+AT_HUB = "Hub"
+
+
+class DeliveryEvent:
+    __slots__ = ("seconds", "sequence", "kind", "package_id", "truck", "mileage")
+
+    def __init__(self, seconds: int, sequence: int, kind: str, package_id: Optional[int], truck, mileage: float) -> None:
+        self.seconds = seconds
+        self.sequence = sequence
+        self.kind = kind
+        self.package_id = package_id
+        self.truck = truck
+        self.mileage = mileage
+
+    def sort_key(self) -> Tuple[int, int]:
+        return (self.seconds, self.sequence)
+
+    def __lt__(self, other: "DeliveryEvent") -> bool:
+        return (self.seconds, self.sequence) < (other.seconds, other.sequence)
+
+    def __str__(self) -> str:
+        truck_name = self.truck.name if self.truck is not None else "N/A"
+        return(f"{self.seconds}, {self.kind}, {self.package_id}, {truck_name}, {self.mileage:.2f}")
+
+
+class EventLog:
+    """
+        Append-only log of delivery events kept sorted by time.
+
+        Every event also goes into a small per-package list, so the status of one
+        package at time T only looks at that package's few events, a full snapshot
+        is a bisect plus one pass over the events before T, and the changes between
+        two times are a bisected slice of the log.
+    """
+    def __init__(self) -> None:
+        self.events = []
+        self.times = []
+        self.by_package = {}
+        self.sequence = 0
+        self.in_order = True
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def __iter__(self):
+        self._sort()
+        return iter(self.events)
+
+    def record(self, seconds: int, kind: str, package_id: Optional[int], truck, mileage: float) -> DeliveryEvent:
+        event = DeliveryEvent(seconds, self.sequence, kind, package_id, truck, mileage)
+        self.sequence += 1
+
+        # trucks are simulated one after another, so an event can be earlier than the
+        # last one; remember that and sort once on the next query instead of inserting
+        if len(self.times) > 0 and seconds < self.times[-1]:
+            self.in_order = False
+        self.events.append(event)
+        self.times.append(seconds)
+
+        if package_id is not None:
+            package_events = self.by_package.setdefault(package_id, [])
+            if len(package_events) > 0 and event < package_events[-1]:
+                self.in_order = False
+            package_events.append(event)
+        return event
+
+    def _sort(self) -> None:
+        if self.in_order:
+            return
+        self.events.sort(key=DeliveryEvent.sort_key)
+        self.times = [event.seconds for event in self.events]
+        for package_events in self.by_package.values():
+            package_events.sort(key=DeliveryEvent.sort_key)
+        self.in_order = True
+
+    def retract(self, package_ids, kind: str = DELIVERED) -> int:
+        """
+            Remove the given packages' events of one kind, e.g. the planned deliveries
+            of a route that is being re-planned.  Returns how many were removed.
+        """
+        self._sort()
+        removed = 0
+        for package_id in package_ids:
+            package_events = self.by_package.get(package_id)
+            if not package_events:
+                continue
+            kept = []
+            for event in package_events:
+                if event.kind != kind:
+                    kept.append(event)
+                    continue
+                # the event sits among the ones with the same time; find it by identity
+                position = bisect_left(self.times, event.seconds)
+                while self.events[position] is not event:
+                    position += 1
+                del self.events[position]
+                del self.times[position]
+                removed += 1
+            self.by_package[package_id] = kept
+        return removed
+
+    def clear(self) -> None:
+        self.events.clear()
+        self.times.clear()
+        self.by_package.clear()
+        self.sequence = 0
+        self.in_order = True
+
+    def last_event(self, package_id: int, seconds: int) -> Optional[DeliveryEvent]:
+        # most recent event for a package at or before the given time
+        self._sort()
+        latest = None
+        for event in self.by_package.get(package_id, ()):
+            if event.seconds > seconds:
+                break
+            latest = event
+        return latest
+
+    def status_at(self, package_id: int, seconds: int) -> Tuple[str, Optional[DeliveryEvent]]:
+        event = self.last_event(package_id, seconds)
+        if event is None:
+            return AT_HUB, None
+        return event.kind, event
+
+    def snapshot(self, seconds: int) -> Dict[int, DeliveryEvent]:
+        """
+            Latest event for every package that has one at or before the given time.
+            Packages missing from the result are still at the hub.
+        """
+        self._sort()
+        latest = {}
+        for event in self.events[:bisect_right(self.times, seconds)]:
+            if event.package_id is not None:
+                latest[event.package_id] = event
+        return latest
+
+    def between(self, start_seconds: int, end_seconds: int) -> List[DeliveryEvent]:
+        # events after start and up to and including end
+        self._sort()
+        return self.events[bisect_right(self.times, start_seconds):bisect_right(self.times, end_seconds)]
+
+    def diff(self, start_seconds: int, end_seconds: int) -> Dict[int, DeliveryEvent]:
+        """
+            Packages whose status changed between two times, mapped to their latest
+            event in that window.  Apply it to snapshot(start) to get snapshot(end).
+        """
+        changed = {}
+        for event in self.between(start_seconds, end_seconds):
+            if event.package_id is not None:
+                changed[event.package_id] = event
+        return changed
@@ -1,14 +1,51 @@
+from typing import Any, Iterable, Iterator, Optional, Tuple
+
 
 class HashTable:
     # default constructor
-    def __init__(self, initial_capacity: int = 10) -> None:
+    def __init__(self, initial_capacity: int = 10, load_factor: float = 0.75,
+                 expected_size: Optional[int] = None) -> None:
+        if load_factor <= 0:
+            raise ValueError("load_factor must be greater than 0")
+        self.load_factor = load_factor
+        self.count = 0
+
+        # size the table up front if the caller knows roughly how many items are coming
+        if expected_size is not None:
+            initial_capacity = max(initial_capacity, int(expected_size / load_factor) + 1)
+
         # initialize the hash table with empty bucket list entries.
         self.table = []
-        for i in range(initial_capacity):
+        for i in range(max(initial_capacity, 1)):
             self.table.append([])
 
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, key: Any) -> bool:
+        return self._find_entry(key) is not None
+
+    # iterate over the keys, like a dict
+    def __iter__(self) -> Iterator[Any]:
+        for bucket in self.table:
+            for entry in bucket:
+                yield entry[0]
+
+    def keys(self) -> Iterator[Any]:
+        return iter(self)
+
+    def values(self) -> Iterator[Any]:
+        for bucket in self.table:
+            for entry in bucket:
+                yield entry[1]
+
+    def items(self) -> Iterator[Tuple[Any, Any]]:
+        for bucket in self.table:
+            for entry in bucket:
+                yield entry[0], entry[1]
+
     def print_table(self) -> None:
-        for count, value in enumerate(self.table): 
+        for count, value in enumerate(self.table):
             print(count, ": ", value)
             # print(count)
             # for i in value:
@@ -20,38 +57,83 @@ class HashTable:
         # find the hashed index value
         index = hash(key) % len(self.table)
         index_list = self.table[index]
- 
+
         # loop through list and update value if key is already there
         for i in index_list:
             #print (key_value)
             if i[0] == key:
                 i[1] = value
                 return True
-        
+
         # if value was not updated already, add value to the index list
         key_value = [key, value]
         index_list.append(key_value)
-        return True 
+        self.count += 1
+
+        # grow the table once the average chain length passes the load factor
+        if self.count > self.load_factor * len(self.table):
+            self.resize(len(self.table) * 2)
+        return True
+
+    # insert many key/value pairs, growing the table once instead of repeatedly
+    def add_many(self, items: Iterable[Tuple[Any, Any]]) -> int:
+        items = list(items)
+        needed = self.count + len(items)
+        if needed > self.load_factor * len(self.table):
+            # at least double, so adding in batches still rehashes each entry only a few times
+            self.resize(max(len(self.table) * 2, int(needed / self.load_factor) + 1))
+
+        added = 0
+        for key, value in items:
+            before = self.count
+            self.add(key, value)
+            added += self.count - before
+        return added
+
+    # rehash every entry into a table with the given number of buckets
+    def resize(self, new_capacity: int) -> None:
+        new_table = []
+        for i in range(max(new_capacity, 1)):
+            new_table.append([])
+
+        for bucket in self.table:
+            for entry in bucket:
+                new_table[hash(entry[0]) % len(new_table)].append(entry)
+        self.table = new_table
+
+    def _find_entry(self, key: Any) -> Optional[list]:
+        # find the hashed index value
+        index = hash(key) % len(self.table)
+        index_list = self.table[index]
+
+        # loop through list and return the entry if matching key is found
+        for i in index_list:
+            if i[0] == key:
+                return i
+        return None
 
     # find a value when provided a key to search for
     def find(self, key: str) -> str:
         # find the hashed index value
         index = hash(key) % len(self.table)
         index_list = self.table[index]
- 
+
         # loop through list and return the value if matching key is found
         for i in index_list:
             if i[0] == key:
                 return i[1]
         return None
- 
+
     # Removes an item with matching key from the hash table.
-    def remove(self, key: str) -> None:
+    def remove(self, key: str) -> bool:
         # find the hashed index value
         index = hash(key) % len(self.table)
         index_list = self.table[index]
- 
-        # loop through the index list and remove the key/value pair
-        for i in index_list:
+
+        # delete the matching entry in place by position
+        for position, i in enumerate(index_list):
             if i[0] == key:
-                index_list.remove([i[0],i[1]])
\ No newline at end of file
+                del index_list[position]
+                self.count -= 1
+                return True
+        return False
@@ -1,20 +1,92 @@
 import datetime
+import sys
+
+# delivery status is stored as an index into this tuple
+STATUS_NAMES = ("Hub", "En Route", "Delivered")
+STATUS_CODES = {name: code for code, name in enumerate(STATUS_NAMES)}
+
+# a manifest only has a handful of distinct deadline strings
+_deadline_seconds = {}
+
+
+def parse_deadline_seconds(deadline: str):
+    """
+        Seconds since midnight for a deadline such as "10:30 AM", or None for EOD.
+        Raises ValueError for anything else.
+    """
+    if deadline in _deadline_seconds:
+        return _deadline_seconds[deadline]
+    text = deadline.strip().upper()
+    seconds = None
+    if text != "" and text != "EOD":
+        ts = datetime.datetime.strptime(text, "%I:%M %p")
+        seconds = ts.hour * 3600 + ts.minute * 60
+    _deadline_seconds[deadline] = seconds
+    return seconds
+
 
 class Package:
+    # slots instead of a per-instance __dict__; status, delivery time and truck are kept
+    # as a small int, seconds since midnight and a truck reference behind properties
+    __slots__ = ("id", "address", "city", "state", "zip", "_deadline", "deadline_seconds", "weight", "notes",
+                 "address_index", "status_code", "delivery_seconds", "truck")
+
     def __init__(self, id: int, address: str, city: str, state: str, zip: str,
-                 deadline: str, weight: int) -> None:
+                 deadline: str, weight: int, notes: str = "", address_index=None) -> None:
         self.id = id
-        self.address = address
-        self.city = city
-        self.state = state
-        self.zip = zip
+        # the same few cities, states, zips and deadlines repeat across a manifest
+        self.address = sys.intern(address)
+        self.city = sys.intern(city)
+        self.state = sys.intern(state)
+        self.zip = sys.intern(zip)
         self.deadline = deadline
         self.weight = weight
-        self.delivery_status = "Hub"
-        self.delivery_time = datetime.time(0, 0, 0)
-        self.delivered_by = "N/A"
+        self.notes = sys.intern(notes)
+        # index of the address in the distance data, when it was resolved at load time
+        self.address_index = address_index
+        self.reset()
+
+    def reset(self) -> None:
+        # back to the hub, undelivered
+        self.status_code = 0
+        self.delivery_seconds = 0
+        self.truck = None
+
+    @property
+    def deadline(self) -> str:
+        return self._deadline
+
+    @deadline.setter
+    def deadline(self, deadline: str) -> None:
+        # parsed once here rather than wherever a deadline is compared
+        self.deadline_seconds = parse_deadline_seconds(deadline)
+        self._deadline = sys.intern(deadline)
+
+    @property
+    def delivery_status(self) -> str:
+        return STATUS_NAMES[self.status_code]
+
+    @delivery_status.setter
+    def delivery_status(self, status: str) -> None:
+        self.status_code = STATUS_CODES[status]
+
+    @property
+    def delivery_time(self) -> datetime.time:
+        seconds = self.delivery_seconds
+        return datetime.time(seconds // 3600, seconds % 3600 // 60, seconds % 60)
+
+    @delivery_time.setter
+    def delivery_time(self, ts: datetime.time) -> None:
+        self.delivery_seconds = ts.hour * 3600 + ts.minute * 60 + ts.second
+
+    @property
+    def delivered_by(self):
+        return self.truck if self.truck is not None else "N/A"
+
+    @delivered_by.setter
+    def delivered_by(self, truck) -> None:
+        self.truck = None if truck == "N/A" else truck
 
     def __str__(self) -> str:
         ts = self.delivery_time.strftime("%H:%M:%S")
         return(f"{self.id}, {self.address}, {self.city}, {self.state}, {self.zip}, {self.deadline}, {self.weight}, {self.delivery_status}, {ts}, {self.delivered_by}")
-
@@ -0,0 +1,198 @@
+from package import Package, parse_deadline_seconds
+from hash_table import HashTable
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import csv
+import itertools
+from typing import Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_CHUNK_SIZE = 20000
+# malformed rows past this many are counted but not kept
+MAX_KEPT_ERRORS = 100
+
+
+class RowError:
+    """
+        A manifest row that was skipped: its line number, why, and its fields.
+    """
+    __slots__ = ("line", "reason", "row")
+
+    def __init__(self, line: int, reason: str, row: List[str]) -> None:
+        self.line = line
+        self.reason = reason
+        self.row = row
+
+    def __str__(self) -> str:
+        return(f"line {self.line}: {self.reason}")
+
+
+class LoadReport:
+    """
+        What a load read and skipped.  Only the first MAX_KEPT_ERRORS skipped rows
+        are kept, so a badly broken file can't use up memory; `skipped` counts all
+        of them.
+    """
+    def __init__(self, max_kept: int = MAX_KEPT_ERRORS) -> None:
+        self.max_kept = max_kept
+        self.rows = 0
+        self.loaded = 0
+        self.skipped = 0
+        self.errors = []
+
+    def add_error(self, error: RowError) -> None:
+        self.skipped += 1
+        if len(self.errors) < self.max_kept:
+            self.errors.append(error)
+
+    def summary(self) -> str:
+        return(f"{self.loaded} of {self.rows} rows loaded, {self.skipped} skipped")
+
+
+def parse_row(row: List[str], address_index: Optional[Dict[str, int]] = None) -> tuple:
+    """
+        Check and convert one manifest row (id, address, city, state, zip,
+        deadline, weight and, optionally, notes) into Package arguments: int id and
+        weight, the deadline checked, and the address resolved when an index is
+        given.  Raises ValueError saying what is wrong, including an address that
+        isn't in the index, since no truck could be routed to it.
+    """
+    if len(row) == 8:
+        package_id, address, city, state, zip, deadline, weight, notes = row
+    elif len(row) == 7:
+        package_id, address, city, state, zip, deadline, weight = row
+        notes = ""
+    else:
+        raise ValueError(f"expected 8 fields, got {len(row)}")
+    try:
+        package_id = int(package_id)
+    except ValueError:
+        raise ValueError(f"package id is not a number: {package_id!r}") from None
+    try:
+        weight = int(weight)
+    except ValueError:
+        raise ValueError(f"weight is not a number: {weight!r}") from None
+    try:
+        parse_deadline_seconds(deadline)
+    except ValueError:
+        raise ValueError(f"unknown deadline: {deadline!r}") from None
+    if address.strip() == "":
+        raise ValueError("no address")
+    if address_index is not None:
+        address_index = address_index.get(address)
+        if address_index is None:
+            raise ValueError(f"unknown address: {address!r}")
+    return package_id, address, city, state, zip, deadline, weight, notes, address_index
+
+
+def parse_lines(lines: List[str], first_line: int,
+                address_index: Optional[Dict[str, int]] = None) -> Tuple[List[tuple], List[RowError]]:
+    # (line, Package arguments) for every good row in a chunk of lines, and an error for every bad one
+    records = []
+    errors = []
+    reader = csv.reader(lines)
+    for row in reader:
+        line = first_line + reader.line_num - 1
+        if not row:
+            continue
+        try:
+            records.append((line, parse_row(row, address_index)))
+        except ValueError as error:
+            errors.append(RowError(line, str(error), row))
+    return records, errors
+
+
+# set in each worker process once, rather than sent with every chunk
+_worker_address_index = None
+
+
+def _init_worker(address_index: Optional[Dict[str, int]]) -> None:
+    global _worker_address_index
+    _worker_address_index = address_index
+
+
+def _parse_in_worker(lines: List[str], first_line: int) -> Tuple[List[tuple], List[RowError]]:
+    return parse_lines(lines, first_line, _worker_address_index)
+
+
+def _line_chunks(file, chunk_size: int) -> Iterator[Tuple[List[str], int]]:
+    # (lines, number of the first one) chunk_size lines at a time
+    first_line = 1
+    while True:
+        lines = list(itertools.islice(file, chunk_size))
+        if not lines:
+            return
+        yield lines, first_line
+        first_line += len(lines)
+
+
+def _numbered_chunks(file: str, address_index: Optional[Dict[str, int]], report: LoadReport, chunk_size: int,
+                     workers: Optional[int]) -> Iterator[List[Tuple[int, Package]]]:
+    # (line, package) for every good row, a chunk at a time
+    def packages(records: List[tuple], errors: List[RowError]) -> List[Tuple[int, Package]]:
+        report.rows += len(records) + len(errors)
+        for error in errors:
+            report.add_error(error)
+        chunk = []
+        for line, (package_id, address, city, state, zip, deadline, weight, notes, index) in records:
+            chunk.append((line, Package(package_id, address, city, state, zip, deadline, weight, notes=notes,
+                                        address_index=index)))
+        return chunk
+
+    with open(file, newline="") as csv_file:
+        if workers is None or workers <= 1:
+            for lines, first_line in _line_chunks(csv_file, chunk_size):
+                yield packages(*parse_lines(lines, first_line, address_index))
+            return
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(address_index,)) as executor:
+            pending = deque()
+            for lines, first_line in _line_chunks(csv_file, chunk_size):
+                pending.append(executor.submit(_parse_in_worker, lines, first_line))
+                if len(pending) >= workers * 2:
+                    yield packages(*pending.popleft().result())
+            while pending:
+                yield packages(*pending.popleft().result())
+
+
+def iter_package_chunks(file: str, address_index: Optional[Dict[str, int]] = None,
+                        report: Optional[LoadReport] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                        workers: Optional[int] = None) -> Iterator[List[Package]]:
+    """
+        Read a manifest chunk_size lines at a time and yield each chunk's packages,
+        in file order.  Malformed rows are skipped and recorded in the report.
+
+        With workers, chunks are parsed in that many processes while this one
+        builds the packages, with no more than two chunks per worker in flight, so
+        memory stays bounded however large the file is.  A row has to be on one
+        line; a quoted field can't span lines.
+    """
+    if report is None:
+        report = LoadReport()
+    for chunk in _numbered_chunks(file, address_index, report, chunk_size, workers):
+        yield [package for line, package in chunk]
+
+
+def load_package_table(file: str, address_index: Optional[Dict[str, int]] = None,
+                       report: Optional[LoadReport] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                       workers: Optional[int] = None) -> HashTable:
+    """
+        Load a manifest into a HashTable keyed by int package id.  A row with a
+        package id that was already loaded is reported as malformed and the first
+        package with it is kept.
+    """
+    if report is None:
+        report = LoadReport()
+    # the row count isn't known until the end; add_many grows the table as chunks come in
+    ht = HashTable()
+    for chunk in _numbered_chunks(file, address_index, report, chunk_size, workers):
+        added = []
+        seen = set()
+        for line, package in chunk:
+            if package.id in seen or package.id in ht:
+                report.add_error(RowError(line, f"duplicate package id {package.id}", [str(package.id)]))
+                continue
+            seen.add(package.id)
+            added.append((package.id, package))
+        report.loaded += ht.add_many(added)
+    return ht
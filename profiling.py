@@ -0,0 +1,180 @@
+from hash_table import HashTable
+from distance_matrix import DistanceMatrix
+from distance_cache import MappedDistanceMatrix
+import atexit
+import contextlib
+import cProfile
+import json
+import os
+import pstats
+import time
+from typing import List, Optional
+
+# set to an output file (.json, or .pstats/.prof for cProfile data) to profile without --profile
+PROFILE_ENV = "WGUPS_PROFILE"
+DEFAULT_PROFILE_FILE = "profile.json"
+PSTATS_SUFFIXES = (".pstats", ".prof")
+
+
+class Profiler:
+    """
+        Phase timings and hot-path counters for one process.
+
+        Disabled, a phase is an empty context manager and counting is skipped by
+        the callers' enabled check, so the pipeline runs at full speed.  Enabling
+        swaps counting versions of the HashTable lookups and the distance matrix
+        lookups onto their classes; disabling puts the originals back.
+    """
+    def __init__(self) -> None:
+        self.enabled = False
+        self.output = None
+        self.phases = {}
+        self.counters = {}
+        self.profile = None
+        self._originals = []
+
+    def enable(self, output: Optional[str] = None) -> None:
+        # with an output file the report is written there when the process exits
+        if self.enabled:
+            return
+        self.enabled = True
+        self.output = output
+        self._instrument()
+        if output is not None and output.endswith(PSTATS_SUFFIXES):
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        if output is not None:
+            atexit.register(self.save)
+
+    def disable(self) -> None:
+        if not self.enabled:
+            return
+        self.enabled = False
+        if self.profile is not None:
+            self.profile.disable()
+        for owner, name, original in reversed(self._originals):
+            setattr(owner, name, original)
+        self._originals = []
+
+    def reset(self) -> None:
+        self.phases = {}
+        self.counters = {}
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            record = self.phases.setdefault(name, {"calls": 0, "seconds": 0.0, "max_seconds": 0.0})
+            record["calls"] += 1
+            record["seconds"] += elapsed
+            record["max_seconds"] = max(record["max_seconds"], elapsed)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def maximum(self, name: str, value: int) -> None:
+        if value > self.counters.get(name, 0):
+            self.counters[name] = value
+
+    def report(self) -> dict:
+        phases = {name: {"calls": record["calls"], "seconds": round(record["seconds"], 6),
+                         "max_seconds": round(record["max_seconds"], 6)}
+                  for name, record in self.phases.items()}
+        counters = dict(sorted(self.counters.items()))
+        lookups = counters.get("hash_table.lookups", 0)
+        if lookups:
+            counters["hash_table.mean_chain"] = round(counters.get("hash_table.chain_total", 0) / lookups, 3)
+            counters["hash_table.mean_probes"] = round(counters.get("hash_table.probes", 0) / lookups, 3)
+        return {"phases": phases, "counters": counters}
+
+    def save(self, output: Optional[str] = None) -> None:
+        """
+            Write the report as json, or the cProfile statistics for a .pstats/.prof
+            file, which pstats and snakeviz read.
+        """
+        output = output or self.output or DEFAULT_PROFILE_FILE
+        if output.endswith(PSTATS_SUFFIXES):
+            if self.profile is None:
+                raise ValueError("cProfile statistics need the profiler enabled with a .pstats output")
+            self.profile.disable()
+            pstats.Stats(self.profile).dump_stats(output)
+            # the timings and counters go next to it
+            output = os.path.splitext(output)[0] + ".json"
+        with open(output, "w") as profile_file:
+            json.dump(self.report(), profile_file, indent=2)
+
+    def _patch(self, owner, name: str, replacement) -> None:
+        self._originals.append((owner, name, owner.__dict__[name]))
+        setattr(owner, name, replacement)
+
+    def _instrument(self) -> None:
+        profiler = self
+
+        def hash_lookup(table, key):
+            # the entry for key, counting the chain it is in and how far along it is
+            bucket = table.table[hash(key) % len(table.table)]
+            profiler.count("hash_table.lookups")
+            profiler.count("hash_table.chain_total", len(bucket))
+            profiler.maximum("hash_table.max_chain", len(bucket))
+            probes = 0
+            for entry in bucket:
+                probes += 1
+                if entry[0] == key:
+                    profiler.count("hash_table.probes", probes)
+                    return entry
+            profiler.count("hash_table.probes", probes)
+            profiler.count("hash_table.misses")
+            return None
+
+        def find(table, key):
+            entry = hash_lookup(table, key)
+            return entry[1] if entry is not None else None
+
+        self._patch(HashTable, "find", find)
+        self._patch(HashTable, "_find_entry", hash_lookup)
+
+        for matrix_class in (DistanceMatrix, MappedDistanceMatrix):
+            distance = matrix_class.__dict__["distance"]
+            row = matrix_class.__dict__.get("row")
+
+            def counted_distance(matrix, start_index, end_index, distance=distance):
+                profiler.count("distance.lookups")
+                return distance(matrix, start_index, end_index)
+
+            self._patch(matrix_class, "distance", counted_distance)
+            if row is not None:
+                def counted_row(matrix, index, row=row):
+                    profiler.count("distance.rows")
+                    return row(matrix, index)
+
+                self._patch(matrix_class, "row", counted_row)
+
+
+# the one profiler every module reports to
+profiler = Profiler()
+
+
+def enable_profiling(argv: List[str]) -> List[str]:
+    """
+        Turn the profiler on for `--profile [FILE]` in argv, or when the
+        WGUPS_PROFILE environment variable names a file.  Returns argv without
+        the profile option.
+    """
+    remaining = list(argv)
+    output = os.environ.get(PROFILE_ENV) or None
+    if "--profile" in remaining:
+        position = remaining.index("--profile")
+        del remaining[position]
+        if position < len(remaining) and not remaining[position].startswith("-"):
+            output = remaining.pop(position)
+        else:
+            output = output or DEFAULT_PROFILE_FILE
+    if output is not None:
+        profiler.enable(output)
+    return remaining
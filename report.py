@@ -0,0 +1,261 @@
+from event_log import AT_HUB, DELIVERED, DEPARTED, EN_ROUTE, RETURNED
+from profiling import enable_profiling, profiler
+from simulation import Simulation
+from utils import load_distance_matrix, seconds_to_time, time_to_seconds
+import argparse
+import csv
+import datetime
+import io
+import json
+import sys
+from typing import Dict, Iterator, List, Optional, TextIO
+
+FORMATS = ("csv", "jsonl")
+WRITE_BUFFER = 1 << 20
+
+# one csv header for both kinds of row; a package row leaves the truck columns empty and the
+# other way around
+CSV_COLUMNS = ["time", "type", "id", "status", "delivered_at", "truck", "deadline", "weight", "address", "city",
+               "state", "zip", "depart_time", "on_board", "delivered", "miles", "first_delivery", "last_delivery"]
+
+# truck status once it has left the hub and has nothing left on board
+FINISHED = "Finished"
+# package status when no truck was loaded with it all day
+UNASSIGNED = "Unassigned"
+
+
+class _TruckStatus:
+    __slots__ = ("truck", "status", "on_board", "delivered", "miles", "first_delivery", "last_delivery")
+
+    def __init__(self, truck) -> None:
+        self.truck = truck
+        self.status = AT_HUB
+        self.on_board = 0
+        self.delivered = 0
+        self.miles = 0.0
+        self.first_delivery = None
+        self.last_delivery = None
+
+
+def _clock(seconds: Optional[int]) -> str:
+    return seconds_to_time(seconds).strftime("%H:%M:%S") if seconds is not None else ""
+
+
+def status_sweep(event_log, trucks, query_seconds: List[int]) -> Iterator[tuple]:
+    """
+        Walk the event log once, in time order, and stop at every query time to
+        yield (seconds, latest event per package, truck statuses).  The dict and
+        statuses are updated in place between yields, so a consumer has to use
+        them before asking for the next time.
+    """
+    statuses = {truck.name: _TruckStatus(truck) for truck in trucks}
+    latest = {}
+    events = list(event_log)
+    position = 0
+    for seconds in sorted(query_seconds):
+        while position < len(events) and events[position].seconds <= seconds:
+            event = events[position]
+            position += 1
+            if event.package_id is not None:
+                latest[event.package_id] = event
+            if event.truck is None:
+                continue
+            status = statuses.get(event.truck.name)
+            if status is None:
+                status = statuses[event.truck.name] = _TruckStatus(event.truck)
+            status.miles = event.mileage
+            if event.kind == DEPARTED:
+                status.status = EN_ROUTE
+            elif event.kind == EN_ROUTE:
+                status.on_board += 1
+            elif event.kind == DELIVERED:
+                status.on_board -= 1
+                status.delivered += 1
+                if status.first_delivery is None:
+                    status.first_delivery = event.seconds
+                status.last_delivery = event.seconds
+                if status.on_board == 0:
+                    status.status = FINISHED
+            elif event.kind == RETURNED:
+                status.status = AT_HUB
+        yield seconds, latest, statuses
+
+
+class ReportWriter:
+    """
+        Streams package status and truck statistics rows as csv or json lines.
+
+        Everything about a package that doesn't change during the day is encoded
+        once, the first time it is written, and clock strings are cached, so a row
+        per query time is one small format of the status and delivery time.
+    """
+    def __init__(self, output: TextIO, output_format: str = "csv") -> None:
+        if output_format not in FORMATS:
+            raise ValueError(f"unknown report format {output_format}, expected one of {', '.join(FORMATS)}")
+        self.output = output
+        self.output_format = output_format
+        self.clocks = {}
+        self.encoded = None
+        self.rows = 0
+        if output_format == "csv":
+            csv.writer(output).writerow(CSV_COLUMNS)
+
+    def _clock(self, seconds: int) -> str:
+        clock = self.clocks.get(seconds)
+        if clock is None:
+            clock = self.clocks[seconds] = _clock(seconds)
+        return clock
+
+    def _encode(self, packages) -> List[tuple]:
+        # (package id, text after the status and delivery time) for every package
+        encoded = []
+        for package in packages:
+            truck_name = package.truck.name if package.truck is not None else ""
+            if self.output_format == "csv":
+                buffer = io.StringIO()
+                csv.writer(buffer, lineterminator="").writerow(
+                    [truck_name, package.deadline, package.weight, package.address, package.city, package.state,
+                     package.zip])
+                tail = f",{buffer.getvalue()},,,,,,\r\n"
+            else:
+                tail = ", " + json.dumps({"truck": truck_name or None, "deadline": package.deadline,
+                                          "weight": package.weight, "address": package.address,
+                                          "city": package.city, "state": package.state, "zip": package.zip})[1:] + "\n"
+            encoded.append((package.id, tail))
+        return encoded
+
+    def write_packages(self, seconds: int, packages, latest: Dict[int, object], unassigned=()) -> None:
+        # the package list has to be the same on every call
+        if self.encoded is None:
+            self.encoded = self._encode(packages)
+        clock = self._clock(seconds)
+        clock_of = self._clock
+        csv_format = self.output_format == "csv"
+        lines = []
+        for package_id, tail in self.encoded:
+            event = latest.get(package_id)
+            if event is None:
+                status, delivered_at = UNASSIGNED if package_id in unassigned else AT_HUB, None
+            else:
+                status = event.kind
+                delivered_at = clock_of(event.seconds) if status == DELIVERED else None
+            if csv_format:
+                lines.append(f"{clock},package,{package_id},{status},{delivered_at or ''}{tail}")
+            else:
+                delivered_at = f'"{delivered_at}"' if delivered_at is not None else "null"
+                lines.append(f'{{"time": "{clock}", "type": "package", "id": {package_id}, "status": "{status}", '
+                             f'"delivered_at": {delivered_at}{tail}')
+        self.output.write("".join(lines))
+        self.rows += len(lines)
+
+    def write_trucks(self, seconds: int, statuses) -> None:
+        clock = _clock(seconds)
+        for status in statuses:
+            truck = status.truck
+            values = [clock, "truck", truck.name, status.status, "", truck.name, "", "", "", "", "", "",
+                      truck.depart_time.strftime("%H:%M:%S"), status.on_board, status.delivered,
+                      round(status.miles, 2), _clock(status.first_delivery), _clock(status.last_delivery)]
+            if self.output_format == "csv":
+                csv.writer(self.output).writerow(values)
+            else:
+                row = dict(zip(CSV_COLUMNS, values))
+                for column in ("delivered_at", "truck", "deadline", "weight", "address", "city", "state", "zip"):
+                    del row[column]
+                row["first_delivery"] = row["first_delivery"] or None
+                row["last_delivery"] = row["last_delivery"] or None
+                self.output.write(json.dumps(row) + "\n")
+            self.rows += 1
+
+
+def write_report(simulation, query_times: List[datetime.time], output: TextIO, output_format: str = "csv",
+                 packages: bool = True, trucks: bool = True) -> int:
+    """
+        Write every package's status and every truck's statistics at each query
+        time, earliest time first.  A package no truck took is Unassigned rather
+        than at the hub.  Returns the number of rows written.
+    """
+    writer = ReportWriter(output, output_format)
+    ordered = sorted(simulation.package_data.values(), key=lambda package: package.id)
+    unassigned = set(simulation.unassigned)
+    query_seconds = [time_to_seconds(query_time) for query_time in query_times]
+    for seconds, latest, statuses in status_sweep(simulation.event_log, simulation.trucks, query_seconds):
+        if packages:
+            writer.write_packages(seconds, ordered, latest, unassigned)
+        if trucks:
+            writer.write_trucks(seconds, statuses.values())
+    return writer.rows
+
+
+def _parse_time(value: str) -> datetime.time:
+    for time_format in ("%H:%M:%S", "%H:%M"):
+        try:
+            return datetime.datetime.strptime(value, time_format).time()
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f"not a time: {value}")
+
+
+def _every(simulation, minutes: int) -> List[datetime.time]:
+    # from the first event of the day to the last, every so many minutes
+    times = [event.seconds for event in simulation.event_log]
+    if not times:
+        return []
+    step = minutes * 60
+    start = times[0] - times[0] % step
+    return [seconds_to_time(seconds) for seconds in range(start, times[-1] + step, step)]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run the delivery day and report package and truck status "
+                                                 "at the given times, without the menu.")
+    parser.add_argument("--times", nargs="+", type=_parse_time, default=[],
+                        help="query times, HH:MM or HH:MM:SS")
+    parser.add_argument("--every", type=int, default=None, metavar="MINUTES",
+                        help="also report every so many minutes across the whole day")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--output", default="-", help="file to write, - for stdout")
+    parser.add_argument("--only", choices=("packages", "trucks"), default=None)
+    parser.add_argument("--addresses", default="data/addresses.csv")
+    parser.add_argument("--distances", default="data/distances.csv")
+    parser.add_argument("--packages", default="data/packages.csv")
+    parser.add_argument("--trucks", type=int, default=None,
+                        help="this many trucks, all leaving at 08:00, instead of the WGUPS three")
+    parser.add_argument("--capacity", type=int, default=16)
+    parser.add_argument("--drivers", type=int, default=None,
+                        help="run the day through the dispatch engine with this many drivers")
+    parser.add_argument("--improve", action="store_true", help="run the 2-opt/Or-opt pass on every route")
+    args = parser.parse_args(enable_profiling(sys.argv[1:] if argv is None else argv))
+
+    with profiler.phase("load_distances"):
+        distance_matrix = load_distance_matrix(args.distances, args.addresses, use_cache=True)
+    depart_times = [datetime.time(8, 0, 0)] * args.trucks if args.trucks is not None else None
+    simulation = Simulation(args.packages, distance_matrix, depart_times=depart_times, capacity=args.capacity,
+                            drivers=args.drivers, improve=args.improve)
+    # stdout may be the report itself
+    if simulation.load_report.skipped:
+        for error in simulation.load_report.errors:
+            print(f"skipped package row, {error}", file=sys.stderr)
+        print(simulation.load_report.summary(), file=sys.stderr)
+    simulation.run()
+    if simulation.unassigned:
+        print(f"{len(simulation.unassigned)} packages were not loaded on any truck: "
+              f"{', '.join(str(package_id) for package_id in sorted(simulation.unassigned))}", file=sys.stderr)
+
+    query_times = list(args.times)
+    if args.every is not None:
+        query_times += _every(simulation, args.every)
+    if not query_times:
+        # end of day
+        query_times = [datetime.time(23, 59, 59)]
+
+    if args.output == "-":
+        output = open(sys.stdout.fileno(), "w", buffering=WRITE_BUFFER, newline="", closefd=False)
+    else:
+        output = open(args.output, "w", buffering=WRITE_BUFFER, newline="")
+    with output, profiler.phase("render"):
+        write_report(simulation, query_times, output, args.format, packages=args.only != "trucks",
+                     trucks=args.only != "packages")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+from collections import OrderedDict
+import json
+import os
+from typing import List, Optional, Tuple
+
+CACHE_FORMAT = 1
+
+
+class RouteCache:
+    """
+        Bounded least-recently-used cache of planned tours.
+
+        A key is the start address index, the departure time in seconds, the
+        frozenset of stop address indices and the distance data version, plus the
+        truck speed and, for improved tours, each stop's deadline, since those
+        change what the 2-opt/Or-opt pass produces.  An entry is the ordered tour
+        of address indices and the cumulative miles at each stop.  With a path the
+        cache can be saved to and loaded from a json file between runs.  With
+        track_added, the keys put are also listed for take_added(), so a worker
+        process can hand its new tours back.
+    """
+    def __init__(self, max_entries: int = 1024, path: Optional[str] = None, track_added: bool = False) -> None:
+        self.max_entries = max_entries
+        self.path = path
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # keys put since the last take_added(), only kept when tracking
+        self.track_added = track_added
+        self.added = []
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self.entries
+
+    @staticmethod
+    def make_key(start_index: int, depart_seconds: int, stops, version: int, speed: float = 18,
+                 deadlines=None) -> tuple:
+        # deadlines: (address index, deadline seconds) for stops that have one, only for improved tours
+        return (start_index, depart_seconds, frozenset(stops), version, speed,
+                frozenset(deadlines) if deadlines is not None else None)
+
+    def get(self, key) -> Optional[Tuple[List[int], List[float]]]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, tour: List[int], mileage: List[float]) -> None:
+        self.entries[key] = (list(tour), list(mileage))
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        if self.track_added:
+            self.added.append(key)
+
+    def take_added(self) -> List[tuple]:
+        # (key, tour, mileage) for every tour put since the last call and still cached
+        added = [(key,) + self.entries[key] for key in self.added if key in self.entries]
+        self.added = []
+        return added
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.added = []
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "hit_rate": round(self.hits / lookups, 4) if lookups else None}
+
+    def save(self, path: Optional[str] = None) -> None:
+        """
+            Write every entry, least recently used first, to a json file.
+        """
+        path = path or self.path
+        records = []
+        for key, (tour, mileage) in self.entries.items():
+            start_index, depart_seconds, stops, version, speed, deadlines = key
+            records.append({"start": start_index, "depart": depart_seconds, "stops": sorted(stops),
+                            "version": version, "speed": speed,
+                            "deadlines": sorted(deadlines) if deadlines is not None else None,
+                            "tour": tour, "mileage": mileage})
+
+        temp_file = f"{path}.{os.getpid()}.tmp"
+        with open(temp_file, "w") as cache_file:
+            json.dump({"format": CACHE_FORMAT, "routes": records}, cache_file)
+        os.replace(temp_file, path)
+
+    def load(self, path: Optional[str] = None) -> int:
+        """
+            Add the entries saved in a json file; a file in another format is ignored.
+            Returns how many were loaded.
+        """
+        path = path or self.path
+        with open(path) as cache_file:
+            data = json.load(cache_file)
+        if data.get("format") != CACHE_FORMAT:
+            return 0
+        for record in data["routes"]:
+            deadlines = record["deadlines"]
+            if deadlines is not None:
+                deadlines = [tuple(deadline) for deadline in deadlines]
+            key = self.make_key(record["start"], record["depart"], record["stops"], record["version"],
+                                record["speed"], deadlines)
+            self.put(key, record["tour"], record["mileage"])
+        self.added = []
+        return len(data["routes"])
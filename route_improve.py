@@ -0,0 +1,165 @@
+import heapq
+import time
+from typing import List, Optional
+
+
+def count_late(path, deadlines, dist, depart_seconds, speed) -> int:
+    """
+        Walk a path the same way deliver_packages does (whole minutes per hop) and
+        count how many stops arrive after their deadline.
+    """
+    late = 0
+    current_seconds = depart_seconds
+    for position in range(1, len(path)):
+        hop = dist(path[position - 1], path[position])
+        current_seconds += int(hop / speed * 60) * 60
+        deadline = deadlines[path[position]]
+        if deadline is not None and current_seconds > deadline:
+            late += 1
+    return late
+
+
+def improve_route(route: List[int], distance_matrix, start_index: int, depart_seconds: int = 0,
+                  deadlines: Optional[List[Optional[int]]] = None, speed: float = 18,
+                  time_limit: Optional[float] = 0.25, max_iterations: Optional[int] = None,
+                  neighbor_count: int = 10) -> List[int]:
+    """
+        Improve an open delivery path with 2-opt and Or-opt moves.
+
+        route is the list of address indices in the order the greedy pass visits
+        them, starting after start_index.  deadlines, if given, holds the deadline
+        in seconds since midnight (or None) for each entry of route.  Moves are
+        evaluated in O(1) from the edges they change, candidates are restricted to
+        each stop's nearest neighbors, and a move is never accepted if it makes more
+        stops late than before.  Returns the improved order as positions into route.
+    """
+    size = len(route)
+    if size < 3:
+        return list(range(size))
+
+    # node `size` is the fixed starting location, nodes 0..size-1 are the stops
+    start_node = size
+    addresses = list(route) + [start_index]
+    node_deadlines = (list(deadlines) + [None]) if deadlines is not None else None
+    check_deadlines = node_deadlines is not None and any(deadline is not None for deadline in node_deadlines)
+
+    # local distance table between the stops on this route so each move is a couple of list lookups
+    distance = distance_matrix.distance
+    table = [[distance(from_address, to_address) for to_address in addresses] for from_address in addresses]
+
+    def dist(a, b):
+        return table[a][b]
+
+    # candidate list for every node: its closest other nodes on this route
+    neighbor_count = min(neighbor_count, size)
+    near = []
+    for node in range(size + 1):
+        row = table[node]
+        closest = heapq.nsmallest(neighbor_count + 1, range(size + 1), key=row.__getitem__)
+        near.append([other for other in closest if other != node][:neighbor_count])
+
+    path = [start_node] + list(range(size))
+    pos = [0] * (size + 1)
+    for index, node in enumerate(path):
+        pos[node] = index
+    length = len(path)
+
+    late = 0
+    if check_deadlines:
+        late = count_late(path, node_deadlines, dist, depart_seconds, speed)
+
+    def accept(candidate):
+        # only re-walk the path when a deadline could be affected
+        nonlocal late
+        if not check_deadlines:
+            return True
+        candidate_late = count_late(candidate, node_deadlines, dist, depart_seconds, speed)
+        if candidate_late > late:
+            return False
+        late = candidate_late
+        return True
+
+    started = time.perf_counter()
+    iterations = 0
+    improved = True
+
+    while improved:
+        improved = False
+
+        # 2-opt: replace edges (a, b) and (c, d) with (a, c) and (b, d) by reversing b..c
+        for i in range(1, length):
+            a = path[i - 1]
+            b = path[i]
+            for c in near[a]:
+                j = pos[c]
+                if j <= i:
+                    continue
+                delta = dist(a, c) - dist(a, b)
+                if j + 1 < length:
+                    d = path[j + 1]
+                    delta += dist(b, d) - dist(c, d)
+                if delta < -1e-9:
+                    candidate = path[:i] + path[i:j + 1][::-1] + path[j + 1:]
+                    if accept(candidate):
+                        path = candidate
+                        for index in range(i, j + 1):
+                            pos[path[index]] = index
+                        b = path[i]
+                        improved = True
+
+        # Or-opt: move a segment of 1-3 stops next to one of its neighbors
+        for segment_length in (1, 2, 3):
+            i = 1
+            while i + segment_length <= length:
+                first = path[i]
+                last = path[i + segment_length - 1]
+                before = path[i - 1]
+                after = path[i + segment_length] if i + segment_length < length else None
+
+                # what we save by cutting the segment out
+                removal = dist(before, first)
+                if after is not None:
+                    removal += dist(last, after) - dist(before, after)
+
+                best_delta = -1e-9
+                best_move = None
+                for endpoint in (first, last):
+                    for c in near[endpoint]:
+                        k = pos[c]
+                        if i - 1 <= k <= i + segment_length - 1:
+                            continue
+                        c_next = path[k + 1] if k + 1 < length else None
+                        if c_next is not None and i <= pos[c_next] <= i + segment_length - 1:
+                            continue
+                        for reverse in (False, True):
+                            head, tail = (last, first) if reverse else (first, last)
+                            insertion = dist(c, head)
+                            if c_next is not None:
+                                insertion += dist(tail, c_next) - dist(c, c_next)
+                            delta = insertion - removal
+                            if delta < best_delta:
+                                best_delta = delta
+                                best_move = (k, reverse)
+
+                if best_move is not None:
+                    k, reverse = best_move
+                    segment = path[i:i + segment_length]
+                    if reverse:
+                        segment.reverse()
+                    rest = path[:i] + path[i + segment_length:]
+                    insert_at = k + 1 if k < i else k + 1 - segment_length
+                    candidate = rest[:insert_at] + segment + rest[insert_at:]
+                    if accept(candidate):
+                        path = candidate
+                        for index, node in enumerate(path):
+                            pos[node] = index
+                        improved = True
+                i += 1
+
+        iterations += 1
+        if max_iterations is not None and iterations >= max_iterations:
+            break
+        if time_limit is not None and time.perf_counter() - started > time_limit:
+            break
+
+    return path[1:]
@@ -0,0 +1,162 @@
+from truck import Truck
+from assignment import assign_packages
+from dispatch import DispatchEngine
+from event_log import DELIVERED, EventLog
+from package_loader import LoadReport
+from profiling import profiler
+from route_cache import RouteCache
+from updates import UPDATABLE_FIELDS, PackageUpdate, update_package
+from utils import load_packages, deliver_packages
+import datetime
+from typing import List, Optional
+
+# Truck A, Truck B and Truck C, in that order
+DEFAULT_DEPART_TIMES = [datetime.time(9, 5, 0), datetime.time(8, 0, 0), datetime.time(10, 20, 0)]
+
+# package 9's address is wrong in the manifest; the right one, 410 S State St., Salt Lake
+# City, UT 84111, becomes known at 10:20
+WGUPS_UPDATES = [PackageUpdate(datetime.time(10, 20, 0), 9, address="410 S State St", zip="84111")]
+
+
+def truck_name(number: int) -> str:
+    # Truck A, Truck B, ... and plain numbers once the alphabet runs out
+    if number <= 26:
+        return f"Truck {chr(ord('A') + number - 1)}"
+    return f"Truck {number}"
+
+
+class Simulation:
+    """
+        One delivery day that can be run again and again in-process.
+
+        The distance matrix and the parsed package manifest are loaded once and
+        kept; run() resets every package's delivery state in place, builds fresh
+        trucks, loads them and delivers, so a re-run costs only the routing.
+
+        By default every truck takes one load, assigned up front, and the trucks
+        are run one after another, then the day's package updates are applied in
+        time order, each re-planning only the open stops of the truck carrying
+        the package.  Tours are kept in a route cache across runs, so a re-run
+        with unchanged loads skips routing.  Given a number of drivers, the day is run by
+        the DispatchEngine instead: trucks share one clock, at most that many are
+        on the road at once and they come back to the hub for more loads.
+    """
+    def __init__(self, package_file: str, distance_matrix, depart_times: Optional[List[datetime.time]] = None,
+                 speed: float = 18, capacity: int = 16, improve: bool = False,
+                 drivers: Optional[int] = None, updates: Optional[List[PackageUpdate]] = None,
+                 route_cache: Optional[RouteCache] = None) -> None:
+        self.package_file = package_file
+        self.distance_matrix = distance_matrix
+        self.depart_times = list(depart_times) if depart_times is not None else list(DEFAULT_DEPART_TIMES)
+        self.speed = speed
+        self.capacity = capacity
+        self.improve = improve
+        self.drivers = drivers
+        self.route_cache = route_cache if route_cache is not None else RouteCache()
+
+        # rows the loader skipped, including packages whose address isn't in the distance data
+        self.load_report = LoadReport()
+        with profiler.phase("load_packages"):
+            self.package_data = load_packages(package_file, distance_matrix.address_index, self.load_report)
+
+        if updates is None:
+            # the WGUPS corrections, where they fit the data and the package was loaded
+            updates = [update for update in WGUPS_UPDATES
+                       if update.changes.get("address") in distance_matrix.address_index
+                       and update.package_id in self.package_data]
+        self.updates = sorted(updates, key=lambda update: update.time)
+        # fields of updated packages as they were loaded, put back by reset()
+        self.originals = {}
+        self.event_log = EventLog()
+        self.trucks = []
+        self.truck_distances = {}
+        self.truck_counts = {}
+        self.unassigned = []
+        self.total_distance = 0.0
+        self.runs = 0
+
+    def reset(self) -> None:
+        # put every package back at the hub, as it is in the manifest, without reloading it
+        for package in self.package_data.values():
+            package.reset()
+        for package_id, fields in self.originals.items():
+            package = self.package_data.find(package_id)
+            for field, value in fields.items():
+                setattr(package, field, value)
+        self.event_log.clear()
+        self.trucks = []
+        self.truck_distances = {}
+        self.truck_counts = {}
+        self.unassigned = []
+        self.total_distance = 0.0
+
+    def run(self) -> float:
+        """
+            Reset, load the trucks and deliver every package.  Returns the total miles.
+        """
+        self.reset()
+        for update in self.updates:
+            self._remember(update)
+        for number, depart_time in enumerate(self.depart_times, start=1):
+            self.trucks.append(Truck(id=number, name=truck_name(number), depart_time=depart_time,
+                                     capacity=self.capacity, speed=self.speed))
+
+        if self.drivers is not None:
+            return self._dispatch()
+
+        # load the trucks from the package notes, deadlines and truck capacity
+        with profiler.phase("load_trucks"):
+            self.unassigned = assign_packages(self.package_data, self.trucks, self.distance_matrix)
+        for truck in self.trucks:
+            self.truck_counts[truck.name] = truck.package_count()
+
+        with profiler.phase("route"):
+            for truck in self.trucks:
+                self.truck_distances[truck.name] = deliver_packages(truck, self.package_data, self.distance_matrix,
+                                                                    improve=self.improve, event_log=self.event_log,
+                                                                    route_cache=self.route_cache)
+        with profiler.phase("updates"):
+            for update in self.updates:
+                self.update(update)
+        self.total_distance = sum(self.truck_distances.values())
+        self.runs += 1
+        return self.total_distance
+
+    def update(self, update: PackageUpdate) -> Optional[Truck]:
+        """
+            Apply one package update to the delivered plan.  Only the open stops of
+            the truck carrying the package are re-planned; returns that truck.
+            Raises ValueError after a run with drivers, where a truck's route holds
+            several loads; give those updates to the simulation before it runs.
+        """
+        if self.drivers is not None:
+            raise ValueError("a day dispatched with drivers can't be updated after it ran; "
+                             "pass the update to Simulation(updates=...) instead")
+        self._remember(update)
+        truck = update_package(self.trucks, self.package_data, self.distance_matrix, update, improve=self.improve,
+                               event_log=self.event_log)
+        if truck is not None:
+            self.truck_distances[truck.name] = truck.route[-1].mileage if truck.route else 0.0
+            self.total_distance = sum(self.truck_distances.values())
+        return truck
+
+    def _remember(self, update: PackageUpdate) -> None:
+        # keep the package's fields from before its first update
+        package = self.package_data.find(update.package_id)
+        if package is not None and package.id not in self.originals:
+            self.originals[package.id] = {field: getattr(package, field)
+                                          for field in UPDATABLE_FIELDS + ("address_index",)}
+
+    def _dispatch(self) -> float:
+        engine = DispatchEngine(self.package_data, self.distance_matrix, self.trucks, drivers=self.drivers,
+                                event_log=self.event_log, improve=self.improve, route_cache=self.route_cache)
+        for update in self.updates:
+            engine.schedule_update(update)
+        with profiler.phase("dispatch"):
+            self.total_distance = engine.run()
+        self.truck_distances = engine.truck_miles()
+        self.truck_counts = engine.truck_deliveries()
+        self.unassigned = [package.id for package in self.package_data.values()
+                           if package.delivery_status != DELIVERED]
+        self.runs += 1
+        return self.total_distance
@@ -0,0 +1,85 @@
+from conftest import DATA_DIR
+from dispatch import DispatchEngine
+from distance_matrix import DistanceMatrix
+from event_log import DELIVERED, EventLog
+from hash_table import HashTable
+from package import Package
+from simulation import DEFAULT_DEPART_TIMES, Simulation, truck_name
+from truck import Truck
+from updates import PackageUpdate
+from utils import load_packages
+import datetime
+import os
+import pytest
+
+
+def make_trucks():
+    return [Truck(id=number, name=truck_name(number), depart_time=depart_time)
+            for number, depart_time in enumerate(DEFAULT_DEPART_TIMES, start=1)]
+
+
+@pytest.mark.parametrize("drivers", [2, 3])
+def test_drivers_deliver_wgups_day_on_time(distance_matrix, drivers):
+    simulation = Simulation(os.path.join(DATA_DIR, "packages.csv"), distance_matrix, drivers=drivers)
+    simulation.run()
+    assert simulation.unassigned == []
+    for package in simulation.package_data.values():
+        assert package.delivery_status == DELIVERED
+        if package.deadline_seconds is not None:
+            assert package.delivery_seconds <= package.deadline_seconds, package.id
+    assert sum(simulation.truck_counts.values()) == 40
+
+
+def test_end_of_day_leaves_late_work_at_hub(distance_matrix):
+    package_data = load_packages(os.path.join(DATA_DIR, "packages.csv"), distance_matrix.address_index)
+    event_log = EventLog()
+    end_time = datetime.time(10, 0, 0)
+    engine = DispatchEngine(package_data, distance_matrix, make_trucks(), drivers=2, event_log=event_log,
+                            end_time=end_time)
+    engine.run()
+
+    end_seconds = 10 * 3600
+    assert all(event.seconds <= end_seconds for event in event_log)
+    delivered = [package for package in package_data.values() if package.delivery_status == DELIVERED]
+    assert 0 < len(delivered) < 40
+    assert all(package.delivery_seconds <= end_seconds for package in delivered)
+    # nothing is left marked as on a truck
+    assert all(package.delivery_status in (DELIVERED, "Hub") for package in package_data.values())
+    for truck in engine.trucks:
+        assert truck.stats.packages == len([package for package in delivered if package.truck is truck])
+
+
+def test_load_stays_near_its_most_urgent_package():
+    # the hub between two towns 40 miles apart, with deadlines alternating between them
+    points = [(0, 0)] + [(20 + offset, offset) for offset in range(8)] + [(-20 - offset, offset) for offset in range(8)]
+    rows = [[str(abs(x1 - x2) + abs(y1 - y2)) for x2, y2 in points[:row + 1]]
+            for row, (x1, y1) in enumerate(points)]
+    distance_matrix = DistanceMatrix(rows, [f"address {index}" for index in range(len(points))])
+    package_data = HashTable()
+    for number in range(32):
+        address_index = 1 + number // 2 % 8 + (8 if number % 2 else 0)
+        package_data.add(number + 1, Package(number + 1, f"address {address_index}", "", "", "", f"9:{number:02d} AM",
+                                             1, address_index=address_index))
+    truck = Truck(id=1, name=truck_name(1), depart_time=datetime.time(8, 0))
+    DispatchEngine(package_data, distance_matrix, [truck]).run()
+
+    first_load = sorted(package_data.values(), key=lambda package: package.delivery_seconds)[:truck.capacity]
+    assert {package.id for package in first_load} == set(range(1, 33, 2))
+
+
+def test_correction_reroutes_the_truck_carrying_the_package(distance_matrix):
+    update = PackageUpdate(datetime.time(8, 30, 0), 39, address="195 W Oakland Ave")
+    simulation = Simulation(os.path.join(DATA_DIR, "packages.csv"), distance_matrix, drivers=3, updates=[update])
+    simulation.run()
+
+    package = simulation.package_data.find(39)
+    assert package.address_index == distance_matrix.address_index["195 W Oakland Ave"]
+    assert package.delivery_status == DELIVERED
+    stops = [stop for stop in package.truck.route if 39 in stop.package_ids]
+    assert [stop.address_index for stop in stops] == [package.address_index]
+    # each stop's miles follow on from the stop before it, or from the hub where a new load starts
+    for truck in simulation.trucks:
+        for before, stop in zip(truck.route, truck.route[1:]):
+            assert stop.mileage in (pytest.approx(before.mileage + distance_matrix.distance(before.address_index,
+                                                                                             stop.address_index)),
+                                    pytest.approx(distance_matrix.distance(0, stop.address_index)))
@@ -0,0 +1,49 @@
+from conftest import DATA_DIR
+from distance_cache import MappedDistanceMatrix, cache_is_current, compile_distances
+from distance_matrix import DistanceMatrix
+from utils import load_addresses, load_distances
+import os
+import shutil
+
+
+def test_mapped_cache_matches_csv(tmp_path):
+    distance_file = os.path.join(DATA_DIR, "distances.csv")
+    addresses = load_addresses(os.path.join(DATA_DIR, "addresses.csv"))
+    cache_file = compile_distances(distance_file, str(tmp_path / "distances.dmcache"))
+    assert cache_is_current(distance_file, cache_file)
+
+    in_memory = DistanceMatrix(load_distances(distance_file), addresses)
+    mapped = MappedDistanceMatrix(cache_file, addresses)
+    try:
+        assert mapped.verify()
+        for start in range(len(in_memory)):
+            assert list(mapped.row(start)) == list(in_memory.row(start))
+            for end in range(len(in_memory)):
+                assert mapped.distance(start, end) == in_memory.distance(start, end)
+        # the same distances are the same version, however they were loaded
+        assert mapped.version() == in_memory.version()
+    finally:
+        mapped.close()
+
+
+def test_changed_csv_gets_new_version(tmp_path):
+    distance_file = str(tmp_path / "distances.csv")
+    shutil.copy(os.path.join(DATA_DIR, "distances.csv"), distance_file)
+    addresses = load_addresses(os.path.join(DATA_DIR, "addresses.csv"))
+    before = DistanceMatrix(load_distances(distance_file), addresses).version()
+
+    with open(distance_file) as csv_file:
+        lines = csv_file.readlines()
+    cells = lines[1].split(",")
+    cells[0] = "9.9"
+    lines[1] = ",".join(cells)
+    with open(distance_file, "w") as csv_file:
+        csv_file.writelines(lines)
+
+    after = DistanceMatrix(load_distances(distance_file), addresses)
+    assert after.version() != before
+    mapped = MappedDistanceMatrix(compile_distances(distance_file), addresses)
+    try:
+        assert mapped.version() == after.version()
+    finally:
+        mapped.close()
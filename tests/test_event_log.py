@@ -0,0 +1,72 @@
+from conftest import DATA_DIR
+from event_log import AT_HUB, DELIVERED, DEPARTED, EN_ROUTE, EventLog
+from simulation import Simulation
+from utils import display_all_package_data
+import contextlib
+import datetime
+import io
+import os
+import random
+
+
+def random_log(seed):
+    # trucks recorded one after another, so times go backwards between them
+    rng = random.Random(seed)
+    log = EventLog()
+    package_id = 0
+    for truck in range(4):
+        depart = 8 * 3600 + rng.randrange(0, 4) * 1800
+        log.record(depart, DEPARTED, None, truck, 0.0)
+        ids = list(range(package_id, package_id + 10))
+        package_id += 10
+        for each in ids:
+            log.record(depart, EN_ROUTE, each, truck, 0.0)
+        seconds = depart
+        for each in ids:
+            seconds += rng.randrange(0, 3) * 600
+            log.record(seconds, DELIVERED, each, truck, 1.0)
+    return log
+
+
+def test_snapshot_plus_diff_is_later_snapshot():
+    log = random_log(1)
+    times = [7 * 3600] + [8 * 3600 + minutes * 60 for minutes in range(0, 300, 10)]
+    for start in times:
+        for end in times:
+            if end < start:
+                continue
+            snapshot = log.snapshot(start)
+            snapshot.update(log.diff(start, end))
+            assert snapshot == log.snapshot(end)
+
+
+def test_status_at():
+    log = random_log(2)
+    for package_id in range(40):
+        assert log.status_at(package_id, 0) == (AT_HUB, None)
+        kind, event = log.status_at(package_id, 24 * 3600)
+        assert kind == DELIVERED and event.package_id == package_id
+
+
+def test_retract():
+    log = random_log(3)
+    before = len(log)
+    assert log.retract([1, 2, 99]) == 2
+    assert len(log) == before - 2
+    assert log.status_at(1, 24 * 3600)[0] == EN_ROUTE
+    assert all(event.package_id not in (1, 2) or event.kind != DELIVERED for event in log)
+    # the log stays sorted and queryable
+    assert list(log) == sorted(log)
+    assert log.diff(0, 24 * 3600)[1].kind == EN_ROUTE
+
+
+def test_display_at_departure_time_without_log(distance_matrix):
+    # a package is en route from the moment its truck leaves, not missing from the table
+    simulation = Simulation(os.path.join(DATA_DIR, "packages.csv"), distance_matrix)
+    simulation.run()
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        display_all_package_data(simulation.package_data, datetime.time(8, 0, 0))
+    rows = [line for line in output.getvalue().splitlines() if line.startswith("| ") and line[2:4].strip().isdigit()]
+    assert len(rows) == 40
+    assert any(EN_ROUTE in row for row in rows)
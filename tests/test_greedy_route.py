@@ -0,0 +1,49 @@
+from distance_matrix import DistanceMatrix
+from truck import Stop
+from utils import greedy_route
+import random
+import pytest
+
+
+def grid_matrix(size, seed):
+    # city-block distances on a small grid, so many candidates are tied
+    rng = random.Random(seed)
+    points = [(rng.randrange(6), rng.randrange(6)) for _ in range(size)]
+    rows = [[str(abs(x1 - x2) + abs(y1 - y2)) for x2, y2 in points[:row + 1]]
+            for row, (x1, y1) in enumerate(points)]
+    return DistanceMatrix(rows, [f"address {index}" for index in range(size)])
+
+
+def nearest_first(stops, distance_matrix, start_index):
+    # the plain repeated scan greedy_route replaces: nearest stop, ties to the earliest in the list
+    remaining = list(stops)
+    route = []
+    while remaining:
+        stop = min(remaining, key=lambda stop: (distance_matrix.distance(start_index, stop.address_index),
+                                                stops.index(stop)))
+        remaining.remove(stop)
+        route.append(stop)
+        start_index = stop.address_index
+    return route
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("stop_count", [3, 40, 119])
+def test_matches_nearest_first_scan(seed, stop_count):
+    # 3 stops on 120 addresses takes the linear scan, more walks the neighbor lists
+    distance_matrix = grid_matrix(120, seed)
+    addresses = random.Random(seed).sample(range(1, 120), stop_count)
+    stops = [Stop(address_index) for address_index in addresses]
+    expected = [stop.address_index for stop in nearest_first(stops, distance_matrix, 0)]
+    assert [stop.address_index for stop in greedy_route(stops, distance_matrix, 0)] == expected
+
+
+def test_linear_scan_and_neighbor_walk_agree():
+    distance_matrix = grid_matrix(200, 99)
+    stops = [Stop(address_index) for address_index in (17, 3, 150, 42, 8)]
+    scanned = [stop.address_index for stop in greedy_route(stops, distance_matrix, 0)]
+    assert not distance_matrix.neighbor_lists
+    # with the lists already built the same stops are routed by walking them
+    for address_index in range(200):
+        distance_matrix.neighbors(address_index)
+    assert [stop.address_index for stop in greedy_route(stops, distance_matrix, 0)] == scanned
@@ -0,0 +1,53 @@
+from hash_table import HashTable
+import pytest
+
+
+def test_add_find_and_update():
+    table = HashTable()
+    assert table.find(1) is None
+    table.add(1, "one")
+    table.add(1, "uno")
+    assert table.find(1) == "uno"
+    assert len(table) == 1 and 1 in table and 2 not in table
+
+
+def test_resizes_at_load_factor():
+    table = HashTable(initial_capacity=4, load_factor=0.75)
+    for key in range(3):
+        table.add(key, key)
+    assert len(table.table) == 4
+    table.add(3, 3)
+    assert len(table.table) == 8
+    assert all(table.find(key) == key for key in range(4))
+
+
+def test_expected_size_and_bad_load_factor():
+    assert len(HashTable(expected_size=100, load_factor=0.5).table) > 200
+    with pytest.raises(ValueError):
+        HashTable(load_factor=0)
+
+
+def test_add_many_counts_new_keys_and_grows_once():
+    table = HashTable(initial_capacity=2)
+    assert table.add_many([(key, str(key)) for key in range(100)]) == 100
+    assert len(table.table) >= 100 / table.load_factor
+    # a repeated key updates its value and isn't counted
+    assert table.add_many([(5, "five"), (100, "100")]) == 1
+    assert len(table) == 101 and table.find(5) == "five"
+
+
+def test_remove():
+    table = HashTable()
+    table.add_many([(key, key) for key in range(10)])
+    assert table.remove(3) is True
+    assert table.remove(3) is False
+    assert len(table) == 9 and table.find(3) is None
+
+
+def test_iteration():
+    table = HashTable(initial_capacity=3)
+    items = {key: key * key for key in range(20)}
+    table.add_many(items.items())
+    assert sorted(table) == sorted(table.keys()) == list(items)
+    assert sorted(table.values()) == sorted(items.values())
+    assert dict(table.items()) == items
@@ -0,0 +1,67 @@
+from conftest import DATA_DIR
+from package_loader import LoadReport, iter_package_chunks, load_package_table
+from simulation import Simulation
+import os
+import pytest
+
+
+BAD_ROWS = [
+    "41,1 Nowhere Rd,Salt Lake City,UT,84111,EOD,5,",
+    "42,too,few",
+    "x,195 W Oakland Ave,Salt Lake City,UT,84115,EOD,5,",
+    "43,195 W Oakland Ave,Salt Lake City,UT,84115,noon,5,",
+    "44,195 W Oakland Ave,Salt Lake City,UT,84115,EOD,heavy,",
+    "45,,Salt Lake City,UT,84115,EOD,5,",
+    "",
+    "1,195 W Oakland Ave,Salt Lake City,UT,84115,EOD,5,",
+    "46,195 W Oakland Ave,Salt Lake City,UT,84115,EOD,5",
+]
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    path = tmp_path / "packages.csv"
+    with open(os.path.join(DATA_DIR, "packages.csv")) as csv_file:
+        rows = csv_file.read().splitlines()
+    path.write_text("\n".join(rows + BAD_ROWS) + "\n")
+    return str(path)
+
+
+@pytest.mark.parametrize("chunk_size, workers", [(20000, None), (7, None), (7, 2)])
+def test_bad_rows_are_reported(distance_matrix, manifest, chunk_size, workers):
+    report = LoadReport()
+    package_data = load_package_table(manifest, distance_matrix.address_index, report, chunk_size=chunk_size,
+                                      workers=workers)
+    assert [str(error) for error in report.errors] == [
+        "line 41: unknown address: '1 Nowhere Rd'",
+        "line 42: expected 8 fields, got 3",
+        "line 43: package id is not a number: 'x'",
+        "line 44: unknown deadline: 'noon'",
+        "line 45: weight is not a number: 'heavy'",
+        "line 46: no address",
+        "line 48: duplicate package id 1",
+    ]
+    assert (report.rows, report.loaded, report.skipped) == (48, 41, 7)
+    assert sorted(package_data.keys()) == list(range(1, 41)) + [46]
+
+    # types are converted once at load time
+    package = package_data.find(1)
+    assert package.city == "Salt Lake City" and package.weight == 21
+    assert package.deadline_seconds == 10 * 3600 + 30 * 60
+    assert package.address_index == distance_matrix.index(package.address)
+    assert package_data.find(46).notes == ""
+
+
+def test_chunks_stream_in_file_order(manifest):
+    # without an address index any address goes, and duplicate ids are left to load_package_table
+    chunks = list(iter_package_chunks(manifest, chunk_size=10))
+    assert [len(chunk) for chunk in chunks] == [10, 10, 10, 10, 3]
+    assert [package.id for chunk in chunks for package in chunk][:40] == list(range(1, 41))
+
+
+def test_simulation_runs_past_bad_rows(distance_matrix, manifest):
+    simulation = Simulation(manifest, distance_matrix)
+    simulation.run()
+    assert simulation.load_report.skipped == 7
+    assert simulation.unassigned == []
+    assert simulation.package_data.find(46).delivery_status == "Delivered"
@@ -0,0 +1,33 @@
+from conftest import DATA_DIR
+from report import UNASSIGNED, write_report
+from simulation import Simulation
+import csv
+import datetime
+import io
+import json
+import os
+
+
+def run_day(distance_matrix, depart_times=None):
+    simulation = Simulation(os.path.join(DATA_DIR, "packages.csv"), distance_matrix, depart_times=depart_times)
+    simulation.run()
+    return simulation
+
+
+def test_csv_rows_per_query_time(distance_matrix):
+    output = io.StringIO()
+    rows = write_report(run_day(distance_matrix), [datetime.time(9, 0), datetime.time(23, 59, 59)], output)
+    records = list(csv.DictReader(io.StringIO(output.getvalue())))
+    assert rows == len(records) == 2 * (40 + 3)
+    end = [record for record in records if record["time"] == "23:59:59" and record["type"] == "package"]
+    assert all(record["status"] == "Delivered" for record in end)
+
+
+def test_unassigned_packages_are_marked(distance_matrix):
+    simulation = run_day(distance_matrix, depart_times=[datetime.time(8, 0)] * 2)
+    assert simulation.unassigned
+    output = io.StringIO()
+    write_report(simulation, [datetime.time(23, 59, 59)], output, "jsonl", trucks=False)
+    statuses = {record["id"]: record["status"] for record in map(json.loads, output.getvalue().splitlines())}
+    assert {package_id for package_id, status in statuses.items() if status == UNASSIGNED} == \
+        set(simulation.unassigned)
@@ -0,0 +1,58 @@
+from conftest import DATA_DIR
+from route_cache import RouteCache
+from simulation import Simulation
+from utils import load_distance_matrix
+import os
+
+
+def test_hit_miss_and_eviction():
+    cache = RouteCache(max_entries=2)
+    key = RouteCache.make_key(0, 8 * 3600, [3, 1, 2], version=1)
+    assert cache.get(key) is None
+    cache.put(key, [1, 2, 3], [1.0, 2.0, 3.0])
+    # the stop set is unordered
+    assert cache.get(RouteCache.make_key(0, 8 * 3600, [1, 2, 3], version=1)) == ([1, 2, 3], [1.0, 2.0, 3.0])
+    # other distance data is another key
+    assert cache.get(RouteCache.make_key(0, 8 * 3600, [1, 2, 3], version=2)) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    cache.put(RouteCache.make_key(0, 9 * 3600, [4], version=1), [4], [1.0])
+    cache.put(RouteCache.make_key(0, 10 * 3600, [5], version=1), [5], [1.0])
+    assert key not in cache and cache.evictions == 1
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "routes.json")
+    cache = RouteCache(path=path)
+    key = RouteCache.make_key(0, 8 * 3600, [1, 2], version=7, deadlines=[(1, 36000)])
+    cache.put(key, [2, 1], [1.5, 2.5])
+    cache.save()
+    assert RouteCache(path=path).get(key) == ([2, 1], [1.5, 2.5])
+
+
+def test_rerun_hits_across_matrix_kinds():
+    distance_file = os.path.join(DATA_DIR, "distances.csv")
+    address_file = os.path.join(DATA_DIR, "addresses.csv")
+    package_file = os.path.join(DATA_DIR, "packages.csv")
+    cache = RouteCache()
+    first = Simulation(package_file, load_distance_matrix(distance_file, address_file), route_cache=cache).run()
+    misses = cache.misses
+    assert misses > 0 and cache.hits == 0
+
+    # the cached tours are reused through the memory-mapped matrix too
+    second = Simulation(package_file, load_distance_matrix(distance_file, address_file, use_cache=True),
+                        route_cache=cache).run()
+    assert second == first
+    assert cache.misses == misses and cache.hits > 0
+
+
+def test_added_keys_only_when_tracking():
+    key = RouteCache.make_key(0, 8 * 3600, [1], version=1)
+    untracked = RouteCache()
+    untracked.put(key, [1], [1.0])
+    assert untracked.added == [] and untracked.take_added() == []
+
+    tracked = RouteCache(track_added=True)
+    tracked.put(key, [1], [1.0])
+    assert tracked.take_added() == [(key, [1], [1.0])]
+    assert tracked.take_added() == []
@@ -0,0 +1,74 @@
+from route_improve import count_late, improve_route
+import math
+import random
+import pytest
+
+
+class PointMatrix:
+    # distances between random points, rounded like the csv data
+    def __init__(self, count, seed):
+        rng = random.Random(seed)
+        self.points = [(rng.uniform(0, 20), rng.uniform(0, 20)) for _ in range(count)]
+
+    def distance(self, start_index, end_index):
+        (x1, y1), (x2, y2) = self.points[start_index], self.points[end_index]
+        return round(math.hypot(x1 - x2, y1 - y2), 1)
+
+
+def greedy(matrix, stops, start):
+    route = []
+    remaining = list(stops)
+    while remaining:
+        start = min(remaining, key=lambda stop: matrix.distance(start, stop))
+        remaining.remove(start)
+        route.append(start)
+    return route
+
+
+def path_length(matrix, start, route):
+    return sum(matrix.distance(a, b) for a, b in zip([start] + route[:-1], route))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_improves_without_making_more_stops_late(seed):
+    matrix = PointMatrix(61, seed)
+    route = greedy(matrix, range(1, 61), 0)
+    rng = random.Random(seed)
+    depart = 8 * 3600
+    deadlines = [depart + rng.randrange(1, 5) * 1800 if rng.random() < 0.3 else None for _ in route]
+
+    order = improve_route(route, matrix, 0, depart_seconds=depart, deadlines=deadlines, time_limit=None)
+    assert sorted(order) == list(range(len(route)))
+    improved = [route[position] for position in order]
+    assert path_length(matrix, 0, improved) <= path_length(matrix, 0, route) + 1e-9
+
+    # count_late walks nodes, so index the deadlines by address
+    by_address = {address: deadline for address, deadline in zip(route, deadlines)}
+    by_address[0] = None
+    assert count_late([0] + improved, by_address, matrix.distance, depart, 18) <= \
+        count_late([0] + route, by_address, matrix.distance, depart, 18)
+
+
+def test_shortens_a_bad_route():
+    matrix = PointMatrix(41, 7)
+    route = list(range(1, 41))
+    order = improve_route(route, matrix, 0, time_limit=None)
+    assert path_length(matrix, 0, [route[position] for position in order]) < path_length(matrix, 0, route)
+
+
+def test_iteration_and_time_limits_stop_it():
+    matrix = PointMatrix(81, 3)
+    route = list(range(1, 81))
+    one_pass = improve_route(route, matrix, 0, time_limit=None, max_iterations=1)
+    # a zero time limit runs exactly one pass too
+    assert improve_route(route, matrix, 0, time_limit=0) == one_pass
+    converged = improve_route(route, matrix, 0, time_limit=None)
+    assert path_length(matrix, 0, [route[p] for p in converged]) <= \
+        path_length(matrix, 0, [route[p] for p in one_pass])
+    assert converged != one_pass
+
+
+def test_short_routes_are_left_alone():
+    matrix = PointMatrix(3, 0)
+    assert improve_route([2, 1], matrix, 0) == [0, 1]
+    assert improve_route([], matrix, 0) == []
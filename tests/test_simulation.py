@@ -0,0 +1,22 @@
+from conftest import DATA_DIR
+from simulation import Simulation
+import os
+
+
+def assert_on_time(simulation):
+    for package in simulation.package_data.values():
+        assert package.delivery_status == "Delivered", package.id
+        if package.deadline_seconds is not None:
+            assert package.delivery_seconds <= package.deadline_seconds, package.id
+
+
+def test_wgups_day(distance_matrix):
+    simulation = Simulation(os.path.join(DATA_DIR, "packages.csv"), distance_matrix)
+    total = simulation.run()
+    assert round(total, 2) == 111.7
+    assert simulation.unassigned == []
+    assert len(simulation.package_data) == 40
+    assert_on_time(simulation)
+    assert sum(truck.stats.late for truck in simulation.trucks) == 0
+    # package 9 is re-routed to its corrected address
+    assert simulation.package_data.find(9).address == "410 S State St"
@@ -0,0 +1,36 @@
+from conftest import DATA_DIR
+from simulation import Simulation, WGUPS_UPDATES
+from updates import PackageUpdate
+import datetime
+import os
+import pytest
+
+
+@pytest.mark.parametrize("drivers", [None, 2])
+def test_rerun_starts_from_the_manifest(distance_matrix, drivers):
+    updates = WGUPS_UPDATES + [PackageUpdate(datetime.time(9, 30, 0), 2, deadline="10:30 AM")]
+    simulation = Simulation(os.path.join(DATA_DIR, "packages.csv"), distance_matrix, drivers=drivers,
+                            updates=updates)
+    first = simulation.run()
+    delivered = {package.id: package.delivery_seconds for package in simulation.package_data.values()}
+    assert simulation.package_data.find(2).deadline == "10:30 AM"
+    assert simulation.package_data.find(9).address == "410 S State St"
+
+    simulation.reset()
+    package_2 = simulation.package_data.find(2)
+    package_9 = simulation.package_data.find(9)
+    assert package_2.deadline == "EOD" and package_2.deadline_seconds is None
+    assert (package_9.address, package_9.zip) == ("300 State St", "84103")
+    assert package_9.address_index == distance_matrix.address_index.get("300 State St")
+
+    assert simulation.run() == first
+    assert {package.id: package.delivery_seconds for package in simulation.package_data.values()} == delivered
+
+
+def test_update_after_a_drivers_run_is_refused(distance_matrix):
+    simulation = Simulation(os.path.join(DATA_DIR, "packages.csv"), distance_matrix, drivers=2)
+    total = simulation.run()
+    with pytest.raises(ValueError):
+        simulation.update(PackageUpdate(datetime.time(10, 30, 0), 18, address="195 W Oakland Ave"))
+    assert simulation.total_distance == total
+    assert simulation.package_data.find(18).address != "195 W Oakland Ave"
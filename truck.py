@@ -1,13 +1,123 @@
+from array import array
 import datetime
 
+class Stop:
+    # one delivery address on a truck's route and every package dropped off there
+    __slots__ = ("address_index", "package_ids", "arrive_seconds", "mileage", "priority")
+
+    def __init__(self, address_index: int, priority: bool = False) -> None:
+        self.address_index = address_index
+        self.package_ids = []
+        self.arrive_seconds = 0
+        self.mileage = 0.0
+        # routed with the truck's priority load rather than its standard load
+        self.priority = priority
+
+    def __str__(self) -> str:
+        return(f"{self.address_index}, {self.package_ids}, {self.arrive_seconds}, {self.mileage:.2f}")
+
+
+class TruckStats:
+    """
+        Running statistics for one truck's day, updated as each delivery happens so
+        reading them never rescans the packages.  Times are seconds since midnight.
+    """
+    __slots__ = ("packages", "miles", "on_time", "late", "loads", "first_seconds", "first_package",
+                 "last_seconds", "last_package", "depart_seconds", "return_seconds", "idle_seconds", "ready_seconds")
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.packages = 0
+        self.miles = 0.0
+        self.on_time = 0
+        self.late = 0
+        self.loads = 0
+        self.first_seconds = None
+        self.first_package = None
+        self.last_seconds = None
+        self.last_package = None
+        # first time it left the hub and the last time it came back, if it did
+        self.depart_seconds = None
+        self.return_seconds = None
+        # time spent parked at the hub between being ready and leaving with a load
+        self.idle_seconds = 0
+        self.ready_seconds = None
+
+    def ready(self, seconds: int) -> None:
+        # the truck is at the hub and could leave from now on
+        self.ready_seconds = seconds
+
+    def departed(self, seconds: int) -> None:
+        if self.ready_seconds is not None and seconds > self.ready_seconds:
+            self.idle_seconds += seconds - self.ready_seconds
+        self.ready_seconds = None
+        if self.depart_seconds is None:
+            self.depart_seconds = seconds
+        self.loads += 1
+
+    def delivered(self, package_id, seconds: int, mileage: float, deadline_seconds=None) -> None:
+        self.packages += 1
+        self.miles = mileage
+        if deadline_seconds is not None and seconds > deadline_seconds:
+            self.late += 1
+        else:
+            self.on_time += 1
+        # ties keep the package delivered first
+        if self.first_seconds is None or seconds < self.first_seconds:
+            self.first_seconds = seconds
+            self.first_package = package_id
+        if self.last_seconds is None or seconds > self.last_seconds:
+            self.last_seconds = seconds
+            self.last_package = package_id
+
+    def returned(self, seconds: int, mileage: float) -> None:
+        self.miles = mileage
+        self.return_seconds = seconds
+        self.ready_seconds = seconds
+
+    @staticmethod
+    def _time(seconds):
+        if seconds is None:
+            return None
+        return datetime.time(seconds // 3600, seconds % 3600 // 60, seconds % 60)
+
+    @property
+    def first_time(self):
+        return self._time(self.first_seconds)
+
+    @property
+    def last_time(self):
+        return self._time(self.last_seconds)
+
+    @property
+    def return_time(self):
+        return self._time(self.return_seconds)
+
+
 class Truck:
-    def __init__(self, id: int, name: str, depart_time: datetime.time) -> None:
+    __slots__ = ("id", "name", "depart_time", "capacity", "speed", "location", "priority_packages",
+                 "standard_packages", "route", "stats")
+
+    def __init__(self, id: int, name: str, depart_time: datetime.time, capacity: int = 16,
+                 speed: float = 18) -> None:
         self.id = id
         self.name = name
         self.depart_time = depart_time
+        self.capacity = capacity
+        self.speed = speed
         self.location = 0
-        self.priority_packages = []
-        self.standard_packages = []
+        # package ids packed as machine ints rather than a list of int objects
+        self.priority_packages = array('l')
+        self.standard_packages = array('l')
+        # stops in the order they were delivered, filled in by deliver_packages
+        self.route = []
+        self.stats = TruckStats()
+        self.stats.ready(depart_time.hour * 3600 + depart_time.minute * 60 + depart_time.second)
+
+    def package_count(self) -> int:
+        return len(self.priority_packages) + len(self.standard_packages)
 
     def __str__(self) -> str:
-        return(f"{self.id}, {self.name}, {self.depart_time}, {self.location}, {self.priority_packages}, {self.standard_packages}")
\ No newline at end of file
+        return(f"{self.id}, {self.name}, {self.depart_time}, {self.location}, {list(self.priority_packages)}, {list(self.standard_packages)}")
\ No newline at end of file
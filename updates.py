@@ -0,0 +1,205 @@
+from package import Package
+from truck import Truck
+from hash_table import HashTable
+from route_improve import improve_route
+from event_log import DELIVERED, EN_ROUTE
+from utils import group_stops, greedy_route, seconds_to_time, stop_deadlines, time_to_seconds
+import datetime
+import sys
+from typing import List, Optional
+
+# package fields an update may change
+UPDATABLE_FIELDS = ("address", "city", "state", "zip", "deadline", "weight", "notes")
+
+
+class PackageUpdate:
+    """
+        A change to one package that becomes known at a given time of day, such as
+        a corrected address or a new deadline.
+    """
+    __slots__ = ("time", "package_id", "changes")
+
+    def __init__(self, time: datetime.time, package_id: int, **changes) -> None:
+        unknown = [field for field in changes if field not in UPDATABLE_FIELDS]
+        if unknown:
+            raise ValueError(f"packages have no updatable field {', '.join(unknown)}")
+        self.time = time
+        self.package_id = package_id
+        self.changes = changes
+
+    def __str__(self) -> str:
+        changes = ", ".join(f"{field}={value}" for field, value in self.changes.items())
+        return(f"{self.time.strftime('%H:%M:%S')}, {self.package_id}, {changes}")
+
+
+def apply_changes(package: Package, changes: dict, address_index: Optional[int] = None) -> None:
+    # a new address without its index is resolved again where it's next routed
+    for field, value in changes.items():
+        setattr(package, field, sys.intern(value) if isinstance(value, str) else value)
+    if "address" in changes:
+        package.address_index = address_index
+
+
+def committed_stops(truck: Truck, at_seconds: int) -> int:
+    """
+        How many stops at the front of the truck's route can no longer change at the
+        given time: the ones already reached plus, once the truck has left the hub,
+        the one it is driving to.  A truck leaving at exactly that time can still
+        take the change into account.
+    """
+    count = 0
+    route = truck.route
+    while count < len(route) and route[count].arrive_seconds <= at_seconds:
+        count += 1
+    if count < len(route) and at_seconds > time_to_seconds(truck.depart_time):
+        count += 1
+    return count
+
+
+def replan_remaining(truck: Truck, package_data: HashTable, distance_matrix, at_seconds: int, add_ids=(),
+                     remove_ids=(), improve: bool = False, improve_time_limit: float = 0.25,
+                     event_log=None) -> float:
+    """
+        Re-route the stops the truck has not committed to at the given time, from
+        where it will be and when, with add_ids put on and remove_ids taken off.
+        The committed stops, and every other truck, are left as they are.  Package
+        delivery times and the event log are brought in line with the new route.
+        Returns the truck's new total miles.
+    """
+    route = truck.route
+    kept = committed_stops(truck, at_seconds)
+    remove_ids = set(remove_ids)
+
+    # where the truck starts from: its last committed stop, or the hub
+    if kept > 0:
+        start_index = route[kept - 1].address_index
+        start_seconds = route[kept - 1].arrive_seconds
+        base_mileage = route[kept - 1].mileage
+    else:
+        start_index = 0
+        start_seconds = time_to_seconds(truck.depart_time)
+        base_mileage = 0.0
+
+    # a package leaving a committed stop still rides to it, it just isn't dropped off
+    for stop in route[:kept]:
+        if remove_ids.intersection(stop.package_ids):
+            stop.package_ids = [package_id for package_id in stop.package_ids if package_id not in remove_ids]
+
+    # the open part of the route, split back into its priority and standard loads in route order
+    priority_ids = []
+    standard_ids = []
+    for stop in route[kept:]:
+        for package_id in stop.package_ids:
+            if package_id not in remove_ids:
+                (priority_ids if stop.priority else standard_ids).append(package_id)
+    for package_id in add_ids:
+        if package_data.find(package_id).deadline_seconds is not None:
+            priority_ids.append(package_id)
+        else:
+            standard_ids.append(package_id)
+
+    if event_log is not None:
+        event_log.retract(priority_ids + standard_ids + list(remove_ids))
+
+    current_seconds = start_seconds
+    distance_traveled = base_mileage
+    planned = route[:kept]
+    for priority, package_list in ((True, priority_ids), (False, standard_ids)):
+        stops = greedy_route(group_stops(package_list, package_data, distance_matrix, priority), distance_matrix,
+                             start_index)
+        if improve and len(stops) > 2:
+            order = improve_route([stop.address_index for stop in stops], distance_matrix, start_index,
+                                  depart_seconds=current_seconds, deadlines=stop_deadlines(stops, package_data),
+                                  speed=truck.speed, time_limit=improve_time_limit)
+            stops = [stops[position] for position in order]
+
+        for stop in stops:
+            delivery_distance = distance_matrix.distance(start_index, stop.address_index)
+            current_seconds += int(delivery_distance / truck.speed * 60) * 60
+            distance_traveled += delivery_distance
+            start_index = stop.address_index
+            stop.arrive_seconds = current_seconds
+            stop.mileage = distance_traveled
+            planned.append(stop)
+
+            delivery_time = seconds_to_time(current_seconds)
+            for package_id in stop.package_ids:
+                package = package_data.find(package_id)
+                package.delivery_status = DELIVERED
+                package.delivery_time = delivery_time
+                package.delivered_by = truck
+                if event_log is not None:
+                    event_log.record(current_seconds, DELIVERED, package_id, truck, distance_traveled)
+
+    truck.route = planned
+
+    # replay the route into the truck's statistics, deliveries may have moved anywhere on it
+    depart_seconds = time_to_seconds(truck.depart_time)
+    truck.stats.reset()
+    truck.stats.ready(depart_seconds)
+    truck.stats.departed(depart_seconds)
+    for stop in planned:
+        for package_id in stop.package_ids:
+            truck.stats.delivered(package_id, stop.arrive_seconds, stop.mileage,
+                                  package_data.find(package_id).deadline_seconds)
+    return planned[-1].mileage if planned else 0.0
+
+
+def update_package(trucks: List[Truck], package_data: HashTable, distance_matrix, update: PackageUpdate,
+                   improve: bool = False, event_log=None) -> Optional[Truck]:
+    """
+        Apply an update to the package store at its time of day and re-plan what is
+        left of the route of the truck carrying the package.  Returns that truck, or
+        None when the package isn't on a truck and nothing had to be re-planned.
+    """
+    package = package_data.find(update.package_id)
+    if package is None:
+        raise KeyError(update.package_id)
+    address_index = None
+    if "address" in update.changes:
+        # fail before anything is changed
+        address_index = distance_matrix.index(update.changes["address"])
+
+    at_seconds = time_to_seconds(update.time)
+    truck = package.truck
+    if truck is not None and package.delivery_status == DELIVERED and package.delivery_seconds <= at_seconds:
+        raise ValueError(f"package {update.package_id} was delivered at {package.delivery_time} "
+                         f"before the update at {update.time}")
+
+    apply_changes(package, update.changes, address_index)
+    if truck is None or truck not in trucks:
+        return None
+
+    # a package still in the open part of the route is simply routed again from its
+    # new data; one on a committed stop, or whose deadline moved it between the
+    # priority and standard loads, is taken off and put back on
+    package_id = update.package_id
+    kept = committed_stops(truck, at_seconds)
+    moved = "deadline" in update.changes or any(package_id in stop.package_ids for stop in truck.route[:kept])
+    replan_remaining(truck, package_data, distance_matrix, at_seconds, add_ids=[package_id] if moved else (),
+                     remove_ids=[package_id] if moved else (), improve=improve, event_log=event_log)
+    return truck
+
+
+def add_package(trucks: List[Truck], package_data: HashTable, distance_matrix, package: Package,
+                at_time: datetime.time, improve: bool = False, event_log=None) -> Truck:
+    """
+        Put a package that turned up during the day into the store and onto the
+        earliest truck still at the hub with room for it.  Returns that truck.
+    """
+    package.address_index = distance_matrix.index(package.address)
+    at_seconds = time_to_seconds(at_time)
+    waiting = sorted((truck for truck in trucks if time_to_seconds(truck.depart_time) >= at_seconds),
+                     key=lambda truck: truck.depart_time)
+    for truck in waiting:
+        if sum(len(stop.package_ids) for stop in truck.route) < truck.capacity:
+            break
+    else:
+        raise ValueError(f"no truck at the hub at {at_time} has room for package {package.id}")
+
+    package_data.add(package.id, package)
+    if event_log is not None:
+        event_log.record(time_to_seconds(truck.depart_time), EN_ROUTE, package.id, truck, 0.0)
+    replan_remaining(truck, package_data, distance_matrix, at_seconds, add_ids=[package.id],
+                     improve=improve, event_log=event_log)
+    return truck
@@ -1,10 +1,17 @@
 from fcntl import F_DUPFD
 from package import Package
-from truck import Truck
+from package_loader import load_package_table
+from truck import Stop, Truck
 from hash_table import HashTable
+from distance_matrix import DistanceMatrix
+from distance_cache import MappedDistanceMatrix, cache_is_current, compile_distances, default_cache_file
+from route_improve import improve_route
+from route_cache import RouteCache
+from profiling import profiler
+from event_log import AT_HUB, DELIVERED, DEPARTED, EN_ROUTE
 import csv
 import datetime
-from typing import List
+from typing import List, Optional
 
 
 class Style:
@@ -41,63 +48,56 @@ def load_distances(file: str) -> List[str]:
     return distance_list
 
 
-def load_packages(file: str) -> HashTable:
+def load_distance_matrix(distance_file: str, address_file: str, use_cache: bool = False,
+                         cache_file: Optional[str] = None) -> DistanceMatrix:
     """
-        comments here
-    """
-    ht = HashTable()
-    with open(file) as csv_file:
-        csv_reader = csv.reader(csv_file, delimiter=',')
-        for row in csv_reader:
-            # print(row)
-            id, address, city, state, zip, deadline, weight, undef = row
-            pack = Package(id, address, city, state, zip, deadline, weight)
-            ht.add(key = id, value = pack)
-    return ht
-
-
-def load_truck(truck: Truck, load_list: List[List[int]]) -> None:
-    priority = True
-    for load in load_list:
-        for package_id in load:
-            if priority is True:
-                truck.priority_packages.append(package_id)
-            else:
-                truck.standard_packages.append(package_id)
-        priority = False
+        Load the distance and address csv files once into a DistanceMatrix.
 
+        With use_cache the distances are read through a memory-mapped binary cache
+        next to the csv, compiled on first use and rebuilt whenever the csv changes.
+        If the cache can't be written the csv is parsed into memory as usual.
+    """
+    address_data = load_addresses(address_file)
+    if use_cache:
+        cache_file = cache_file or default_cache_file(distance_file)
+        try:
+            if not cache_is_current(distance_file, cache_file):
+                compile_distances(distance_file, cache_file)
+            return MappedDistanceMatrix(cache_file, address_data)
+        except OSError:
+            pass
+    return DistanceMatrix(load_distances(distance_file), address_data)
+
+
+def load_packages(file: str, address_index=None, report=None, workers=None) -> HashTable:
+    """
+        Load the package manifest into a HashTable keyed by int package id.  With
+        an address index each package's address is resolved as it is read.
+        Malformed rows are skipped and listed in the report, see package_loader.
+    """
+    return load_package_table(file, address_index, report, workers=workers)
 
-def get_distance(distance_list: List[str], start_address: int, end_address: int) -> float:
-    num = 0.0
-    if distance_list[start_address][end_address] != '':
-        num = float(distance_list[start_address][end_address])
-    else:
-        num = float(distance_list[end_address][start_address])
-    return num
 
+def time_to_seconds(ts: datetime.time) -> int:
+    return ts.hour * 3600 + ts.minute * 60 + ts.second
 
-def first_last_times(package_data, truck_name):
-    first_time = datetime.time(23, 59, 59)
-    last_time = datetime.time(0, 0, 0)
-    first_package = None
-    last_package = None
 
-    for i in range(1, 41):
-        package = package_data.find(str(i))
-        package_truck = package.delivered_by.name
+def seconds_to_time(seconds: int) -> datetime.time:
+    seconds = int(seconds) % 86400
+    return datetime.time(seconds // 3600, seconds % 3600 // 60, seconds % 60)
 
-        if truck_name == package_truck:
-            if package.delivery_time < first_time:
-                first_time = package.delivery_time
-                first_package = package
-            if package.delivery_time > last_time:
-                last_time = package.delivery_time
-                last_package = package
 
-    return first_time, last_time, first_package, last_package
+def parse_deadline(deadline: str) -> Optional[datetime.time]:
+    """
+        Turn a package deadline such as "10:30 AM" into a time, or None for EOD.
+    """
+    deadline = deadline.strip()
+    if deadline == "" or deadline.upper() == "EOD":
+        return None
+    return datetime.datetime.strptime(deadline.upper(), "%I:%M %p").time()
 
 
-def display_all_package_data(package_data, display_time):
+def display_all_package_data(package_data, display_time, event_log=None):
     header = "+----+-----------+----------+-------------+-----------+--------+---------------------------------------------------------------------+"
     print(header)
     print(
@@ -106,58 +106,59 @@ def display_all_package_data(package_data, display_time):
     )
     print(header)
 
-    for i in range(1, 41):
-        # print(i)
-        package = package_data.find(str(i))
+    display_seconds = time_to_seconds(display_time) if display_time is not None else None
+
+    for package in sorted(package_data.values(), key=lambda p: p.id):
         address_str = package.address + ", " + package.city + ", " + package.state + ", " + package.zip
 
         delivery_status = package.delivery_status
         delivery_time = package.delivery_time
         delivery_truck = package.delivered_by
-        truck_name = delivery_truck.name
-        truck_start_time = delivery_truck.depart_time
-
-        if display_time is not None:
-            if display_time < package.delivery_time and display_time < truck_start_time:
-                delivery_status = "Hub"
+        truck_name = delivery_truck.name if isinstance(delivery_truck, Truck) else delivery_truck
+        truck_start_time = delivery_truck.depart_time if isinstance(delivery_truck, Truck) else None
+
+        if display_time is not None and event_log is not None:
+            # look the status up in the delivery event log
+            delivery_status, event = event_log.status_at(package.id, display_seconds)
+            if delivery_status == DELIVERED:
+                delivery_time = seconds_to_time(event.seconds)
+            else:
                 delivery_time = datetime.time(0, 0, 0)
-
-                print(
-                    f"| "
-                    f"{package.id :>2} | "
-                    f"{delivery_status :<9} | "
-                    f"{package.deadline :<8} | "
-                    f"{delivery_time.strftime('%H:%M:%S %p') :<11} | "
-                    f"{truck_name :<9} | "
-                    f"{package.weight :>6} | "
-                    f"{address_str :<67} | "
-                )
-            elif display_time < package.delivery_time and display_time > truck_start_time:
-                delivery_status = "En Route"
+        elif display_time is not None:
+            if truck_start_time is None:
+                delivery_status = AT_HUB
+            elif display_time < package.delivery_time and display_time < truck_start_time:
+                delivery_status = AT_HUB
+                delivery_time = datetime.time(0, 0, 0)
+            elif display_time < package.delivery_time:
+                # on the truck from the moment it leaves
+                delivery_status = EN_ROUTE
                 delivery_time = datetime.time(0, 0, 0)
+            else:
+                delivery_status = DELIVERED
 
-                print(
-                    f"| "
-                    f"{package.id :>2} | "
-                    f"{Style.YELLOW}{delivery_status :<9}{Style.RESET} | "
-                    f"{Style.YELLOW}{package.deadline :<8}{Style.RESET} | "
-                    f"{Style.YELLOW}{delivery_time.strftime('%H:%M:%S %p') :<11}{Style.RESET} | "
-                    f"{Style.YELLOW}{truck_name :<9}{Style.RESET} | "
-                    f"{package.weight :>6} | "
-                    f"{address_str :<67} | "
-                )
-
-            elif display_time >= package.delivery_time:
-                print(
-                    f"| "
-                    f"{package.id :>2} | "
-                    f"{Style.GREEN}{delivery_status :<9}{Style.RESET} | "
-                    f"{Style.GREEN}{package.deadline :<8}{Style.RESET} | "
-                    f"{Style.GREEN}{delivery_time.strftime('%H:%M:%S %p') :<11}{Style.RESET} | "
-                    f"{Style.GREEN}{truck_name :<9}{Style.RESET} | "
-                    f"{package.weight :>6} | "
-                    f"{address_str :<67} | "
-                )
+        if display_time is not None and delivery_status == EN_ROUTE:
+            print(
+                f"| "
+                f"{package.id :>2} | "
+                f"{Style.YELLOW}{delivery_status :<9}{Style.RESET} | "
+                f"{Style.YELLOW}{package.deadline :<8}{Style.RESET} | "
+                f"{Style.YELLOW}{delivery_time.strftime('%H:%M:%S %p') :<11}{Style.RESET} | "
+                f"{Style.YELLOW}{truck_name :<9}{Style.RESET} | "
+                f"{package.weight :>6} | "
+                f"{address_str :<67} | "
+            )
+        elif display_time is not None and delivery_status == DELIVERED:
+            print(
+                f"| "
+                f"{package.id :>2} | "
+                f"{Style.GREEN}{delivery_status :<9}{Style.RESET} | "
+                f"{Style.GREEN}{package.deadline :<8}{Style.RESET} | "
+                f"{Style.GREEN}{delivery_time.strftime('%H:%M:%S %p') :<11}{Style.RESET} | "
+                f"{Style.GREEN}{truck_name :<9}{Style.RESET} | "
+                f"{package.weight :>6} | "
+                f"{address_str :<67} | "
+            )
         else:
             print(
                 f"| "
@@ -173,83 +174,197 @@ def display_all_package_data(package_data, display_time):
     print(header)
 
 
-def nearest_neighbor(package_list, package_data, address_data, distance_data, start_index, start_ts):
-    min_distance = float('inf')
-    nearest_package_id = 0
-    nearest_target_index = 0
-
+def group_stops(package_list, package_data, distance_matrix, priority=False) -> List[Stop]:
+    """
+        Group a load by resolved address index into stops, in the order each address
+        first appears in package_list.  Packages within a stop keep their list order.
+    """
+    stops = {}
     for package_id in package_list:
-        package = package_data.find(str(package_id))
-
-        # check to see if this is package 9 which had an incorrect address, if so, fix it
-        if package_id == 9:
-            # 410 S State St., Salt Lake City, UT 84111
-            package.address = "410 S State St"
-            # package.address = "4300 S 1300 E"
-            package.zip = "84111"
-
-        target_address = package.address
-        target_index = address_data.index(target_address)
-        start_address = address_data[start_index]
-        distance = get_distance(distance_list = distance_data, start_address = start_index, end_address = target_index)
-
-        # print(f"Package: {package_id}, Start Time: {start_ts}")
-        # print(f"Starting Index: {start_index}, Starting Address: {start_address}")
-        # print(f"Target Index: {target_index}, Target Address: {target_address}")
-        # print(f"Target Distance: {distance}")
-        # print()
-        
-        if distance < min_distance and nearest_package_id != package_id:
-            min_distance = distance
-            nearest_package_id = package_id
-            nearest_target_index = target_index
-
-    # print()
-    # print()
-    # print()
-
-    return nearest_package_id, nearest_target_index, min_distance
-
-
-def deliver_packages(truck, package_data, address_data, distance_data) -> int:
-    truck_name = truck.name
-    start_index = 0
-    distance_traveled = 0
-    start_ts = truck.depart_time
-
-    load_list = [truck.priority_packages, truck.standard_packages]
-    for package_list in load_list:
-        while len(package_list) > 0:
-            # print(package_list)
-            # find the closest target from the current_list of packages
-            next_package, next_address_index, delivery_distance = nearest_neighbor(package_list, package_data,
-                                                                                address_data, distance_data, start_index,
-                                                                                start_ts)
-
-            # print(f"{Style.GREEN}Delivering Package! {next_package}, {delivery_distance}, {next_address_index}{Style.RESET}")
-            # print()
-            # print()
-
-            # calculate the drive time and delivery time
-            elapsed_time = int(delivery_distance / 18 * 60)
-            delta = datetime.timedelta(minutes = elapsed_time)
-            delivery_time = (datetime.datetime.combine(datetime.date.today(), start_ts) + delta).time()
-            
-            start_index = next_address_index
-            package_list.remove(next_package)
-            start_ts = delivery_time
-            distance_traveled += delivery_distance
-
-            # do some updates to the package data
-            delivered_package = package_data.find(str(next_package))
+        package = package_data.find(package_id)
+        address_index = package.address_index
+        if address_index is None:
+            address_index = distance_matrix.index(package.address)
+        stop = stops.get(address_index)
+        if stop is None:
+            stop = Stop(address_index, priority)
+            stops[address_index] = stop
+        stop.package_ids.append(package_id)
+
+    if profiler.enabled:
+        profiler.count("route.packages_grouped", len(package_list))
+        profiler.count("route.stops", len(stops))
+        profiler.maximum("route.max_packages_per_stop", max((len(stop.package_ids) for stop in stops.values()),
+                                                            default=0))
+    return list(stops.values())
+
+
+def greedy_route(stops, distance_matrix, start_index) -> List[Stop]:
+    """
+        Order stops nearest first.
+
+        Each step walks the current address's distance-sorted neighbor list only
+        until it reaches an address that still has a stop, or just scans the stops
+        when there are few of them and that address has no list yet.  Ties go to the
+        stop that comes first in `stops`.
+    """
+    remaining = {}
+    for position, stop in enumerate(stops):
+        remaining[stop.address_index] = (position, stop)
+
+    route = []
+    scanned = 0
+    while len(remaining) > 0:
+        # a handful of stops on a big network: scanning them beats sorting every address
+        if start_index not in distance_matrix.neighbor_lists and len(remaining) * 16 < len(distance_matrix):
+            scanned += len(remaining)
+            position, stop = min(remaining.values(), key=lambda entry: (
+                distance_matrix.distance(start_index, entry[1].address_index), entry[0]))
+            route.append(stop)
+            del remaining[stop.address_index]
+            start_index = stop.address_index
+            continue
+
+        neighbors, distances = distance_matrix.neighbors(start_index)
+
+        # first address in distance order that still has a stop
+        walk = 0
+        while neighbors[walk] not in remaining:
+            walk += 1
+        scanned += walk + 1
+        nearest_distance = distances[walk]
+
+        # among every address at that same distance, take the earliest stop
+        best_index = neighbors[walk]
+        walk += 1
+        while walk < len(neighbors) and distances[walk] == nearest_distance:
+            candidate = neighbors[walk]
+            if candidate in remaining and remaining[candidate][0] < remaining[best_index][0]:
+                best_index = candidate
+            walk += 1
+
+        route.append(remaining.pop(best_index)[1])
+        start_index = best_index
+
+    if profiler.enabled:
+        profiler.count("route.nearest_neighbor_steps", len(route))
+        profiler.count("route.candidates_scanned", scanned)
+    return route
+
+
+def stop_deadlines(stops, package_data) -> List[Optional[int]]:
+    # earliest package deadline at each stop, in seconds, or None when none has one
+    deadlines = []
+    for stop in stops:
+        package_deadlines = [package_data.find(package_id).deadline_seconds
+                             for package_id in stop.package_ids]
+        package_deadlines = [deadline for deadline in package_deadlines if deadline is not None]
+        deadlines.append(min(package_deadlines) if package_deadlines else None)
+    return deadlines
+
+
+def plan_route(truck, package_data, distance_matrix, start_index=0, start_seconds=None, improve=False,
+               improve_time_limit=0.25, route_cache: Optional[RouteCache] = None) -> List[Stop]:
+    """
+        Route the truck's priority load and then its standard load from start_index,
+        one stop per address, and fill in each stop's arrival time and the miles
+        driven since start.  Packages are not touched.  With a route cache, a load
+        whose start, departure time and stops were routed before reuses that tour.
+    """
+    current_seconds = time_to_seconds(truck.depart_time) if start_seconds is None else start_seconds
+    distance_traveled = 0.0
+    planned = []
+
+    for priority, package_list in ((True, truck.priority_packages), (False, truck.standard_packages)):
+        # one stop per address, however many packages go there
+        stops = group_stops(package_list, package_data, distance_matrix, priority)
+
+        cached = None
+        if route_cache is not None and len(stops) > 0:
+            deadlines = None
+            if improve:
+                deadlines = [(stop.address_index, deadline)
+                             for stop, deadline in zip(stops, stop_deadlines(stops, package_data))
+                             if deadline is not None]
+            key = RouteCache.make_key(start_index, current_seconds, [stop.address_index for stop in stops],
+                                      distance_matrix.version(), truck.speed, deadlines)
+            cached = route_cache.get(key)
+
+        if profiler.enabled and len(stops) > 0:
+            profiler.count("route.loads")
+            profiler.count("route.cached_loads" if cached is not None else "route.routed_loads")
+        if cached is not None:
+            by_address = {stop.address_index: stop for stop in stops}
+            route = [by_address[address_index] for address_index in cached[0]]
+        else:
+            route = greedy_route(stops, distance_matrix, start_index)
+
+            # optionally tighten the greedy tour with 2-opt / Or-opt moves
+            if improve and len(route) > 2:
+                if profiler.enabled:
+                    profiler.count("route.improved_loads")
+                order = improve_route([stop.address_index for stop in route], distance_matrix, start_index,
+                                      depart_seconds=current_seconds, deadlines=stop_deadlines(route, package_data),
+                                      speed=truck.speed, time_limit=improve_time_limit)
+                route = [route[position] for position in order]
+
+        load_start = distance_traveled
+        load_mileage = []
+        for position, stop in enumerate(route):
+            delivery_distance = distance_matrix.distance(start_index, stop.address_index)
+
+            # calculate the drive time in whole minutes and the arrival time
+            elapsed_time = int(delivery_distance / truck.speed * 60)
+            current_seconds += elapsed_time * 60
+            if cached is not None:
+                distance_traveled = load_start + cached[1][position]
+            else:
+                distance_traveled += delivery_distance
+                load_mileage.append((load_mileage[-1] if load_mileage else 0.0) + delivery_distance)
+            start_index = stop.address_index
+
+            stop.arrive_seconds = current_seconds
+            stop.mileage = distance_traveled
+            planned.append(stop)
+
+        if route_cache is not None and cached is None and len(route) > 0:
+            # miles from the start of this load, so the tour can follow any earlier load
+            route_cache.put(key, [stop.address_index for stop in route], load_mileage)
+
+    return planned
+
+
+def deliver_packages(truck, package_data, distance_matrix, improve=False, improve_time_limit=0.25,
+                     event_log=None, route_cache: Optional[RouteCache] = None) -> float:
+    # everything on the truck goes en route when it leaves the hub
+    depart_seconds = time_to_seconds(truck.depart_time)
+    truck.stats.departed(depart_seconds)
+    if event_log is not None:
+        event_log.record(depart_seconds, DEPARTED, None, truck, 0.0)
+        for package_id in truck.priority_packages + truck.standard_packages:
+            event_log.record(depart_seconds, EN_ROUTE, package_id, truck, 0.0)
+
+    truck.route = plan_route(truck, package_data, distance_matrix, improve=improve,
+                             improve_time_limit=improve_time_limit, route_cache=route_cache)
+
+    distance_traveled = 0.0
+    for stop in truck.route:
+        delivery_time = seconds_to_time(stop.arrive_seconds)
+        distance_traveled = stop.mileage
+
+        # do some updates to the package data for every package at this stop
+        for next_package in stop.package_ids:
+            delivered_package = package_data.find(next_package)
             delivered_package.delivery_status = "Delivered"
             delivered_package.delivery_time = delivery_time
             delivered_package.delivered_by = truck
+            truck.stats.delivered(next_package, stop.arrive_seconds, distance_traveled,
+                                  delivered_package.deadline_seconds)
 
-        # print(package_data.print_table())
-
-    return distance_traveled
-
-
+            if event_log is not None:
+                event_log.record(stop.arrive_seconds, DELIVERED, next_package, truck, distance_traveled)
 
+    del truck.priority_packages[:]
+    del truck.standard_packages[:]
 
+    return distance_traveled
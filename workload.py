@@ -0,0 +1,154 @@
+import argparse
+import csv
+import math
+import os
+import random
+from typing import List, Optional, Tuple
+
+STREETS = ["State St", "Main St", "Highland Dr", "Redwood Rd", "Bangerter Hwy", "Wasatch Blvd", "Van Winkle Expy",
+           "Parkway Blvd", "Canyon Rd", "Oakland Ave", "Dalton Ave", "Price Ave", "Lester St", "Taylorsville Blvd"]
+GRID_STREETS = ["S", "E", "W", "N"]
+CITIES = [("Salt Lake City", "UT", 84101), ("West Valley City", "UT", 84119), ("Murray", "UT", 84107),
+          ("Holladay", "UT", 84117), ("Millcreek", "UT", 84106), ("Taylorsville", "UT", 84123)]
+
+# share of packages with each kind of note / deadline
+DEADLINES = [("9:00 AM", 0.03), ("10:30 AM", 0.22), ("EOD", 0.75)]
+TRUCK_NOTE_RATE = 0.05
+DELAYED_NOTE_RATE = 0.05
+WRONG_ADDRESS_RATE = 0.01
+GROUP_RATE = 0.03
+
+
+def _street_address(rng: random.Random, used: set) -> str:
+    # mix of named streets and Salt Lake style grid addresses, never repeated
+    while True:
+        if rng.random() < 0.5:
+            address = f"{rng.randrange(100, 9999)} {rng.choice(STREETS)}"
+        else:
+            address = f"{rng.randrange(100, 9999)} {rng.choice(GRID_STREETS)} {rng.randrange(1, 99) * 100} {rng.choice(GRID_STREETS)}"
+        if address not in used:
+            used.add(address)
+            return address
+
+
+def generate_addresses(count: int, rng: random.Random) -> Tuple[List[Tuple[str, str]], List[Tuple[float, float]]]:
+    """
+        Make `count` named addresses with map coordinates in miles.  The first one is
+        the hub in the middle of the map, the rest are spread around a handful of
+        neighborhood centers so routes look like a real metro area.
+    """
+    radius = max(5.0, math.sqrt(count) * 0.6)
+    centers = [(rng.uniform(-radius, radius), rng.uniform(-radius, radius)) for _ in range(max(3, count // 200))]
+
+    used = set()
+    addresses = [("Western Governors University", "4001 South 700 East")]
+    used.add(addresses[0][1])
+    points = [(0.0, 0.0)]
+    for index in range(1, count):
+        center_x, center_y = rng.choice(centers)
+        spread = radius / 4
+        points.append((center_x + rng.gauss(0, spread), center_y + rng.gauss(0, spread)))
+        addresses.append((f"Location {index}", _street_address(rng, used)))
+    return addresses, points
+
+
+def write_addresses(file: str, addresses: List[Tuple[str, str]]) -> None:
+    with open(file, "w", newline="") as csv_file:
+        csv_writer = csv.writer(csv_file)
+        for index, (name, street) in enumerate(addresses):
+            csv_writer.writerow([index, name, street])
+
+
+def write_distances(file: str, points: List[Tuple[float, float]], road_factor: float = 1.3) -> None:
+    # lower-triangular, one decimal place, blank cells above the diagonal, like data/distances.csv
+    count = len(points)
+    with open(file, "w", buffering=1 << 20) as csv_file:
+        for row, (row_x, row_y) in enumerate(points):
+            cells = [f"{math.hypot(row_x - col_x, row_y - col_y) * road_factor:.1f}" for col_x, col_y in points[:row]]
+            cells.append("0.0")
+            cells.extend([""] * (count - row - 1))
+            csv_file.write(",".join(cells))
+            csv_file.write("\n")
+
+
+def write_packages(file: str, addresses: List[Tuple[str, str]], count: int, rng: random.Random,
+                   trucks: int = 3) -> None:
+    """
+        Write `count` packages to random non-hub addresses with deadlines, weights and
+        notes in the same free-text form as data/packages.csv.
+    """
+    deadline_names = [name for name, _ in DEADLINES]
+    deadline_weights = [weight for _, weight in DEADLINES]
+    zips = {}
+
+    rows = []
+    for package_id in range(1, count + 1):
+        address_index = rng.randrange(1, len(addresses))
+        street = addresses[address_index][1]
+        city, state, base_zip = CITIES[address_index % len(CITIES)]
+        zip_code = zips.setdefault(address_index, str(base_zip + address_index % 40))
+        deadline = rng.choices(deadline_names, deadline_weights)[0]
+        weight = max(1, int(rng.expovariate(1 / 12)))
+        rows.append([package_id, street, city, state, zip_code, deadline, weight, ""])
+
+    # notes: each package gets at most one, groups only join packages without notes
+    position = 0
+    while position < count:
+        roll = rng.random()
+        row = rows[position]
+        if roll < TRUCK_NOTE_RATE:
+            row[7] = f"Can only be on truck {rng.randrange(1, trucks + 1)}"
+        elif roll < TRUCK_NOTE_RATE + DELAYED_NOTE_RATE:
+            row[7] = "Delayed on flight---will not arrive to depot until 9:05 am"
+            row[5] = rng.choice(["10:30 AM", "EOD", "EOD"])
+        elif roll < TRUCK_NOTE_RATE + DELAYED_NOTE_RATE + WRONG_ADDRESS_RATE:
+            row[7] = "Wrong address listed"
+            row[5] = "EOD"
+        elif roll < TRUCK_NOTE_RATE + DELAYED_NOTE_RATE + WRONG_ADDRESS_RATE + GROUP_RATE and position + 2 < count:
+            partners = [rows[position + 1], rows[position + 2]]
+            if all(partner[7] == "" for partner in partners):
+                row[7] = f"Must be delivered with {partners[0][0]}, {partners[1][0]}"
+                position += 2
+        position += 1
+
+    with open(file, "w", newline="", buffering=1 << 20) as csv_file:
+        csv_writer = csv.writer(csv_file)
+        csv_writer.writerows(rows)
+
+
+def generate_workload(directory: str, addresses: int = 1000, packages: int = 5000, trucks: int = 3,
+                      seed: Optional[int] = 0) -> Tuple[str, str, str]:
+    """
+        Write addresses.csv, distances.csv and packages.csv of the requested size into
+        `directory` and return their paths in that order.
+    """
+    if addresses < 2:
+        raise ValueError("need at least the hub and one delivery address")
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    address_file = os.path.join(directory, "addresses.csv")
+    distance_file = os.path.join(directory, "distances.csv")
+    package_file = os.path.join(directory, "packages.csv")
+
+    address_list, points = generate_addresses(addresses, rng)
+    write_addresses(address_file, address_list)
+    write_distances(distance_file, points)
+    write_packages(package_file, address_list, packages, rng, trucks=trucks)
+    return address_file, distance_file, package_file
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic WGUPS workload.")
+    parser.add_argument("directory", help="where to write addresses.csv, distances.csv and packages.csv")
+    parser.add_argument("--addresses", type=int, default=1000)
+    parser.add_argument("--packages", type=int, default=5000)
+    parser.add_argument("--trucks", type=int, default=3, help="highest truck number used in truck notes")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for file in generate_workload(args.directory, args.addresses, args.packages, args.trucks, args.seed):
+        print(file)
+
+
+if __name__ == "__main__":
+    main()